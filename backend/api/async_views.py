@@ -0,0 +1,214 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.utils.encoders import JSONEncoder
+
+from .geo import filter_inside, property_grid_index
+from .models import Need, Offer, Property
+from .params import InvalidParameter, parse_limit, parse_nearby, parse_polygon, parse_rank
+from .ranking import rank_needs, rank_offers
+from .routers import use_replica_for_reads
+from .search import client_name_index, property_address_index, realtor_name_index
+from .serializers import ClientSerializer, NeedSerializer, OfferSerializer, PropertySerializer, RealtorSerializer
+
+# Нечёткий и геопоиск, ранжирование и сериализация выполняются в этом пуле, а не в цикле событий.
+# Пул потоков, а не процессов: индексы поиска живут в памяти процесса и обновляются сигналами
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ASYNC_CPU_WORKERS', 4),
+    thread_name_prefix='async-cpu',
+)
+
+
+def _call(context, func, args):
+    try:
+        return context.run(func, *args)
+    finally:
+        # Поток пула может обращаться к БД (ленивая загрузка индексов, ранжирование)
+        close_old_connections()
+
+
+async def run_cpu(func, *args):
+    """
+    Выполняет func в пуле _executor, не блокируя цикл событий. Пул ограничен
+    ASYNC_CPU_WORKERS потоками, лишние задачи ждут в его очереди. Контекст (маршрутизация
+    чтения между основной базой и репликой) передаётся в поток пула.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _call, contextvars.copy_context(), func, args)
+
+
+def _response(data, status=200):
+    # Кодировщик DRF, чтобы ответы совпадали с синхронными действиями (Decimal — числом)
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _error(message, status=400):
+    return _response({'error': message}, status=status)
+
+
+def _not_found(model):
+    return _response({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
+
+
+def _serialize(serializer_class, instances, request, extra=None):
+    """
+    Данные сериализатора; extra — (имя поля, значения) для добавления к каждому объекту.
+    """
+    data = serializer_class(instances, many=True, context={'request': request}).data
+    if extra is not None:
+        name, values = extra
+        for item, value in zip(data, values):
+            item[name] = value
+    return data
+
+
+async def _in_order(queryset, pks):
+    objects = await queryset.ain_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
+
+
+async def _name_search(request, index, serializer_class):
+    use_replica_for_reads()
+    query = request.GET.get('query', '').strip()
+    if not query:
+        return _error('Query parameter is required')
+    pks = await run_cpu(index.search, query)
+    objects = await _in_order(index.model.objects.all(), pks)
+    return _response(await run_cpu(_serialize, serializer_class, objects, request))
+
+
+@require_safe
+async def client_search(request):
+    """
+    Асинхронный вариант ClientViewSet.search.
+    """
+    return await _name_search(request, client_name_index, ClientSerializer)
+
+
+@require_safe
+async def realtor_search(request):
+    """
+    Асинхронный вариант RealtorViewSet.search.
+    """
+    return await _name_search(request, realtor_name_index, RealtorSerializer)
+
+
+@require_safe
+async def property_search_by_address(request):
+    """
+    Асинхронный вариант PropertyViewSet.search_by_address.
+    """
+    use_replica_for_reads()
+    query = request.GET.get('query', '').strip().lower()
+    if not query:
+        return _error('Query parameter is required')
+
+    try:
+        limit = parse_limit(request.GET)
+    except InvalidParameter as error:
+        return _error(str(error))
+
+    ranked = await run_cpu(property_address_index.search, query, limit)
+    properties = await Property.objects.ain_bulk([pk for pk, _ in ranked])
+    found = [(properties[pk], score) for pk, score in ranked if pk in properties]
+    data = await run_cpu(
+        _serialize, PropertySerializer, [property for property, _ in found], request,
+        ('score', [score for _, score in found]),
+    )
+    return _response(data)
+
+
+@require_safe
+async def property_nearby(request):
+    """
+    Асинхронный вариант PropertyViewSet.nearby.
+    """
+    use_replica_for_reads()
+    try:
+        latitude, longitude, radius_km, k = parse_nearby(request.GET)
+    except InvalidParameter as error:
+        return _error(str(error))
+
+    nearest = await run_cpu(property_grid_index.nearby, latitude, longitude, radius_km, k)
+    properties = await Property.objects.ain_bulk([pk for pk, _ in nearest])
+    found = [(properties[pk], distance) for pk, distance in nearest if pk in properties]
+    data = await run_cpu(
+        _serialize, PropertySerializer, [property for property, _ in found], request,
+        ('distance_km', [round(distance, 3) for _, distance in found]),
+    )
+    return _response(data)
+
+
+@require_safe
+async def property_search_in_region(request):
+    """
+    Асинхронный вариант PropertyViewSet.search_in_region.
+    """
+    use_replica_for_reads()
+    try:
+        polygon = parse_polygon(request.GET)
+    except InvalidParameter as error:
+        return _error(str(error))
+
+    candidate_ids = await run_cpu(property_grid_index.within_polygon, polygon)
+    min_lat, min_lon, max_lat, max_lon = polygon.bounds
+    candidates = Property.objects.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+    properties = await _in_order(candidates, candidate_ids)
+    properties = await run_cpu(filter_inside, polygon, properties)
+    return _response(await run_cpu(_serialize, PropertySerializer, properties, request))
+
+
+async def _matching(request, source, matches, rank, serializer_class, key):
+    try:
+        ranked, k = parse_rank(request.GET)
+    except InvalidParameter as error:
+        return _error(str(error))
+
+    if ranked:
+        top = await run_cpu(rank, source, matches, k)
+        objects = await _in_order(serializer_class.setup_eager_loading(matches.model.objects.all()), [pk for pk, _ in top])
+        data = await run_cpu(_serialize, serializer_class, objects, request, ('score', [score for _, score in top]))
+        count = await matches.acount()
+    else:
+        objects = [instance async for instance in serializer_class.setup_eager_loading(matches)]
+        data = await run_cpu(_serialize, serializer_class, objects, request)
+        count = len(data)
+    return _response({
+        'count': count,
+        key: data,
+        'create_deal_endpoint': request.build_absolute_uri('/api/deals/'),
+    })
+
+
+@require_safe
+async def offer_matching_needs(request, pk):
+    """
+    Асинхронный вариант OfferViewSet.matching_needs.
+    """
+    use_replica_for_reads()
+    try:
+        offer = await OfferSerializer.setup_eager_loading(Offer.objects.all()).aget(pk=pk)
+    except Offer.DoesNotExist:
+        return _not_found(Offer)
+    return await _matching(request, offer, Need.objects.filter(matches__offer=offer), rank_needs, NeedSerializer, 'needs')
+
+
+@require_safe
+async def need_matching_offers(request, pk):
+    """
+    Асинхронный вариант NeedViewSet.matching_offers.
+    """
+    use_replica_for_reads()
+    try:
+        need = await NeedSerializer.setup_eager_loading(Need.objects.all()).aget(pk=pk)
+    except Need.DoesNotExist:
+        return _not_found(Need)
+    return await _matching(request, need, Offer.objects.filter(matches__need=need), rank_offers, OfferSerializer, 'offers')
@@ -0,0 +1,186 @@
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+
+from .caching import bump_generation
+from .commissions import invalidate_commissions
+from .geo import property_grid_index
+from .matching import refresh_batch_matches
+from .models import Client, Deal, Need, Offer, Property
+from .search import client_name_index, property_address_index
+from .serializers import PrefetchedPrimaryKeyRelatedField
+
+# Связь сделки с изменёнными объектами, по которой сбрасывается кэш комиссий
+DEAL_LOOKUPS = {
+    Property: 'offer__property__in',
+    Offer: 'offer__in',
+    Need: 'need__in',
+}
+
+
+def sync_bulk_write(model, instances, created):
+    """
+    Повторяет работу обработчиков post_save (api/signals.py) для объектов,
+    записанных через bulk_create или bulk_update: эти методы сигналов не отправляют.
+    Совпадения и поколение кэша ответов пересчитываются один раз на весь пакет.
+    """
+    pks = [instance.pk for instance in instances]
+    for instance in instances:
+        if model is Client:
+            client_name_index.update(instance)
+        elif model is Property:
+            property_address_index.update(instance)
+            property_grid_index.update(instance)
+
+    if model is Offer:
+        refresh_batch_matches(offer_ids=pks)
+    elif model is Need:
+        refresh_batch_matches(need_ids=pks)
+    elif model is Property and not created:
+        refresh_batch_matches(offer_ids=list(Offer.objects.filter(property_id__in=pks).values_list('id', flat=True)))
+
+    if not created and instances and model in DEAL_LOOKUPS:
+        invalidate_commissions(Deal.objects.filter(**{DEAL_LOOKUPS[model]: instances}))
+    bump_generation(model)
+
+
+def _row_pk(row):
+    value = row.get('id') if isinstance(row, dict) else row
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BulkMixin:
+    """
+    Пакетные операции по адресу <ресурс>/bulk/ со списком в теле запроса:
+    POST — создание, PATCH — частичное обновление (в каждой строке нужен id),
+    DELETE — удаление по списку id.
+    Строки с ошибками пропускаются, остальные записываются одной транзакцией;
+    ошибки возвращаются вместе с индексом строки в запросе.
+    """
+    bulk_batch_size = 500
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk', parser_classes=[JSONParser])
+    def bulk(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'error': 'Expected a list.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.method == 'POST':
+            return Response(self._bulk_create(rows), status=status.HTTP_201_CREATED)
+        if request.method == 'PATCH':
+            return Response(self._bulk_update(rows))
+        return Response(self._bulk_delete(rows))
+
+    def bulk_delete_errors(self, instances):
+        """
+        Возвращает словарь id -> причина для объектов, которые нельзя удалить.
+        """
+        return {}
+
+    def _bulk_model(self):
+        return self.get_serializer_class().Meta.model
+
+    def _bulk_chunks(self, rows):
+        for start in range(0, len(rows), self.bulk_batch_size):
+            yield start, rows[start:start + self.bulk_batch_size]
+
+    def _bulk_prefetch(self, rows):
+        """
+        Загружает объекты связей всех строк одним запросом на каждую связь.
+        """
+        prefetched = {}
+        for name, field in self.get_serializer().fields.items():
+            if not isinstance(field, PrefetchedPrimaryKeyRelatedField):
+                continue
+            pks = {_row_pk({'id': row.get(name)}) for row in rows if isinstance(row, dict)}
+            pks.discard(None)
+            queryset = field.get_queryset()
+            prefetched.setdefault(queryset.model, {}).update(queryset.in_bulk(pks))
+        return prefetched
+
+    def _bulk_serializer(self, prefetched, *args, **kwargs):
+        context = self.get_serializer_context()
+        context['prefetched'] = prefetched
+        return self.get_serializer(*args, context=context, **kwargs)
+
+    def _bulk_create(self, rows):
+        model = self._bulk_model()
+        prefetched = self._bulk_prefetch(rows)
+        created, errors = [], []
+
+        with transaction.atomic():
+            for start, chunk in self._bulk_chunks(rows):
+                instances = []
+                for index, row in enumerate(chunk, start):
+                    serializer = self._bulk_serializer(prefetched, data=row)
+                    if serializer.is_valid():
+                        instances.append(model(**serializer.validated_data))
+                    else:
+                        errors.append({'index': index, 'errors': serializer.errors})
+                model.objects.bulk_create(instances)
+                sync_bulk_write(model, instances, created=True)
+                created.extend(instance.pk for instance in instances)
+
+        return {'created': created, 'errors': errors}
+
+    def _bulk_update(self, rows):
+        model = self._bulk_model()
+        prefetched = self._bulk_prefetch(rows)
+        updated, errors = [], []
+
+        with transaction.atomic():
+            for start, chunk in self._bulk_chunks(rows):
+                existing = self.get_queryset().in_bulk({_row_pk(row) for row in chunk} - {None})
+                changed, fields = {}, set()
+                for index, row in enumerate(chunk, start):
+                    instance = existing.get(_row_pk(row))
+                    if instance is None:
+                        errors.append({'index': index, 'errors': {'id': ['Объект не найден.']}})
+                        continue
+                    serializer = self._bulk_serializer(prefetched, instance, data=row, partial=True)
+                    if not serializer.is_valid():
+                        errors.append({'index': index, 'errors': serializer.errors})
+                        continue
+                    for field, value in serializer.validated_data.items():
+                        setattr(instance, field, value)
+                    fields.update(serializer.validated_data)
+                    changed[instance.pk] = instance
+
+                instances = list(changed.values())
+                if instances and fields:
+                    model.objects.bulk_update(instances, sorted(fields))
+                sync_bulk_write(model, instances, created=False)
+                updated.extend(changed)
+
+        return {'updated': updated, 'errors': errors}
+
+    def _bulk_delete(self, rows):
+        model = self._bulk_model()
+        deleted, errors = [], []
+
+        with transaction.atomic():
+            for start, chunk in self._bulk_chunks(rows):
+                existing = self.get_queryset().in_bulk({_row_pk(row) for row in chunk} - {None})
+                blocked = self.bulk_delete_errors(list(existing.values()))
+                pks = []
+                for index, row in enumerate(chunk, start):
+                    pk = _row_pk(row)
+                    if pk not in existing:
+                        errors.append({'index': index, 'errors': {'id': ['Объект не найден.']}})
+                    elif pk in blocked:
+                        errors.append({'index': index, 'errors': {'id': [blocked[pk]]}})
+                    elif pk not in pks:
+                        pks.append(pk)
+                # Удаление через queryset отправляет post_delete для каждого объекта,
+                # поэтому индексы и кэши обновляют обычные обработчики сигналов
+                model.objects.filter(pk__in=pks).delete()
+                deleted.extend(pks)
+
+        return {'deleted': deleted, 'errors': errors}
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .routers import reading_from_replica
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+
+def _generation_key(model):
+    return f'api-generation:{model._meta.label_lower}'
+
+
+def bump_generation(*models):
+    """
+    Отмечает изменение данных моделей после фиксации транзакции.
+    Поколение — метка времени в наносекундах: новое значение никогда не совпадает со старым,
+    даже если ключ поколения был вытеснен из кэша.
+    """
+    keys = [_generation_key(model) for model in models]
+    transaction.on_commit(lambda: caches[RESPONSE_CACHE_ALIAS].set_many(
+        {key: time.time_ns() for key in keys}, timeout=None,
+    ))
+
+
+def current_generations(models):
+    cache = caches[RESPONSE_CACHE_ALIAS]
+    keys = [_generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+class CachedResponseMixin:
+    """
+    Кэширует ответы list и retrieve с учётом полной строки запроса и отдаёт 304
+    по If-None-Match. Кэш сбрасывается сменой поколения моделей из cache_models,
+    которое обновляют сигналы после фиксации транзакции.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, super().retrieve, *args, **kwargs)
+
+    def _cached_response(self, request, view, *args, **kwargs):
+        # Потоковые ответы не кэшируются. Внутри открытой транзакции (в том числе в
+        # тестах) поколения ещё не знают о её изменениях
+        if request.query_params.get('stream') or transaction.get_connection().in_atomic_block:
+            return view(request, *args, **kwargs)
+
+        cache = caches[RESPONSE_CACHE_ALIAS]
+        generations = current_generations(self.cache_models)
+        raw_key = f'{self.basename}|{self.action}|{request.get_host()}|{request.get_full_path()}|{generations}'
+        key = 'api-response:' + hashlib.md5(raw_key.encode()).hexdigest()
+
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = json.dumps(response.data, cls=JSONEncoder, sort_keys=True)
+            etag = '"' + hashlib.md5(content.encode()).hexdigest() + '"'
+            entry = (response.data, etag)
+            # Ответ по реплике может не содержать последних записей, а ключ уже с новым поколением;
+            # смена поколения во время расчёта — данные могли быть прочитаны до изменения
+            if not reading_from_replica() and current_generations(self.cache_models) == generations:
+                cache.set(key, entry)
+
+        # Только ETag: Last-Modified с точностью до секунды не отличил бы запись
+        # в ту же секунду и дал бы устаревший 304
+        data, etag = entry
+        response = Response(data, headers={'ETag': etag})
+        return get_conditional_response(request._request, etag=etag, response=response)
@@ -0,0 +1,129 @@
+import hashlib
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Deal, Realtor, compute_commissions
+
+CACHE_ALIAS = 'commissions'
+
+DEAL_COLUMNS = (
+    'id', 'offer__price', 'offer__property__property_type',
+    'need__realtor_id', 'need__realtor__commission_share',
+    'offer__realtor_id', 'offer__realtor__commission_share',
+)
+
+
+def iter_commissions(deals):
+    """
+    Рассчитывает комиссии для всех сделок queryset'а одним запросом.
+    Возвращает пары (строка сделки по DEAL_COLUMNS, словарь комиссий).
+    """
+    for row in deals.values_list(*DEAL_COLUMNS).order_by('id').iterator(chunk_size=5000):
+        _, price, property_type, _, seller_share, _, buyer_share = row
+        yield row, compute_commissions(price, property_type, seller_share, buyer_share)
+
+
+def commission_report(deals, realtor_id=None):
+    """
+    Сводный отчёт по комиссиям: итоги по всем сделкам, выплаты каждому риэлтору и доход компании.
+    Если передан realtor_id, в списке риэлторов остаётся только он.
+    """
+    totals = defaultdict(Decimal)
+    realtor_payments = defaultdict(Decimal)
+    realtor_deals = defaultdict(int)
+    count = 0
+
+    for row, commissions in iter_commissions(deals):
+        count += 1
+        for key, value in commissions.items():
+            totals[key] += value
+        seller_realtor_id, buyer_realtor_id = row[3], row[5]
+        realtor_payments[seller_realtor_id] += commissions['seller_realtor_payment']
+        realtor_payments[buyer_realtor_id] += commissions['buyer_realtor_payment']
+        realtor_deals[seller_realtor_id] += 1
+        if buyer_realtor_id != seller_realtor_id:
+            realtor_deals[buyer_realtor_id] += 1
+
+    if realtor_id is not None:
+        realtor_payments = {realtor_id: realtor_payments.get(realtor_id, Decimal(0))}
+
+    realtors = Realtor.objects.in_bulk(list(realtor_payments))
+    return {
+        'deals': count,
+        'totals': dict(totals),
+        'company': {
+            'from_sellers': totals['company_payment_seller'],
+            'from_buyers': totals['company_payment_buyer'],
+            'total': totals['company_payment_seller'] + totals['company_payment_buyer'],
+        },
+        'realtors': [
+            {
+                'realtor': pk,
+                'full_name': realtors[pk].full_name if pk in realtors else None,
+                'deals': realtor_deals.get(pk, 0),
+                'payment': payment,
+            }
+            for pk, payment in sorted(realtor_payments.items())
+        ],
+    }
+
+
+def _version_key(deal_id):
+    return f'deal-commissions-version:{deal_id}'
+
+
+def _result_key(deal_id, version):
+    return f'deal-commissions:{deal_id}:{version}'
+
+
+def _inputs_version(price, property_type, seller_share, buyer_share):
+    inputs = f'{price}|{property_type}|{seller_share}|{buyer_share}'
+    return hashlib.sha1(inputs.encode()).hexdigest()[:16]
+
+
+def cached_commissions(deal_id):
+    """
+    Комиссии сделки из кэша. Результат хранится под ключом из id сделки и версии,
+    вычисленной по входным данным (цена, тип недвижимости, доли риэлторов).
+    Записи живут не дольше TIMEOUT кэша CACHE_ALIAS. Возвращает None, если сделки не существует.
+    """
+    cache = caches[CACHE_ALIAS]
+    version_key = _version_key(deal_id)
+    seen = cache.get(version_key)
+    if seen is not None:
+        result = cache.get(_result_key(deal_id, seen))
+        if result is not None:
+            return result
+
+    row = Deal.objects.filter(pk=deal_id).values_list(*DEAL_COLUMNS).first()
+    if row is None:
+        return None
+    _, price, property_type, _, seller_share, _, buyer_share = row
+    version = _inputs_version(price, property_type, seller_share, buyer_share)
+    result = compute_commissions(price, property_type, seller_share, buyer_share)
+    # Сброс во время расчёта означает, что строка могла быть прочитана до изменения
+    if cache.get(version_key) == seen:
+        cache.set_many({version_key: version, _result_key(deal_id, version): result})
+    return result
+
+
+def invalidate_commissions(deals):
+    """
+    Сбрасывает кэш комиссий сделок после фиксации транзакции.
+    deals — queryset сделок или список их id.
+    """
+    if not isinstance(deals, (list, tuple)):
+        deals = list(deals.values_list('id', flat=True))
+    if deals:
+        keys = [_version_key(deal_id) for deal_id in deals]
+        # Новая метка вместо удаления: cached_commissions замечает сброс, случившийся во время расчёта
+        transaction.on_commit(lambda: caches[CACHE_ALIAS].set_many(dict.fromkeys(keys, f'reset:{time.time_ns()}')))
+
+
+def invalidate_realtor_commissions(realtor):
+    invalidate_commissions(Deal.objects.filter(Q(need__realtor=realtor) | Q(offer__realtor=realtor)))
@@ -0,0 +1,153 @@
+from django.db import connections
+from django.db.models import CharField, F, Func, Q
+
+from .models import Client, Need, Property
+
+# Модель -> поля, проиндексированные в таблице FTS5 <таблица модели>_fts (токенизатор trigram)
+FULLTEXT_FIELDS = {
+    Client: ('last_name', 'first_name', 'patronymic'),
+    Property: ('city', 'street', 'house_number', 'apartment_number'),
+    Need: ('city', 'street', 'house_number', 'apartment_number'),
+}
+# Триграммный индекс находит только фрагменты не короче трёх символов
+MIN_TERM_LENGTH = 3
+
+
+def fts_table(table):
+    return f'{table}_fts'
+
+
+def _trigger_sql(table, columns):
+    fts = fts_table(table)
+    names = ', '.join(columns)
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {', '.join('new.' + name for name in columns)});"
+    delete = (
+        f"INSERT INTO {fts}({fts}, rowid, {names}) "
+        f"VALUES ('delete', old.id, {', '.join('old.' + name for name in columns)});"
+    )
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END',
+    ]
+
+
+def create_index(schema_editor, table, columns):
+    """
+    Создаёт таблицу FTS5 с внешним содержимым (текст хранится только в самой таблице модели),
+    триггеры синхронизации и заполняет индекс. Триггеры срабатывают и на bulk_create,
+    update() и загрузку из api/transfer.py, которые обходят сигналы. Только для SQLite.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    fts = fts_table(table)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({', '.join(columns)}, "
+        f"content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    for statement in _trigger_sql(table, columns):
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_index(schema_editor, table):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    fts = fts_table(table)
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def restore_triggers(connection):
+    """
+    Пересоздаёт недостающие триггеры. Миграции SQLite, пересоздающие таблицу модели
+    (ALTER через копирование), удаляют её триггеры вместе со старой таблицей; id строк
+    при этом сохраняются, поэтому сам индекс остаётся верным.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        existing = set(connection.introspection.table_names(cursor))
+        for model, columns in FULLTEXT_FIELDS.items():
+            table = model._meta.db_table
+            if fts_table(table) in existing:
+                for statement in _trigger_sql(table, columns):
+                    cursor.execute(statement)
+
+
+def _casefold(value):
+    return value.casefold() if isinstance(value, str) else value
+
+
+def register_functions(connection):
+    """
+    Регистрирует в соединении SQLite функцию CASEFOLD: встроенные LOWER и LIKE
+    меняют регистр только у латиницы.
+    """
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('CASEFOLD', 1, _casefold, deterministic=True)
+
+
+class CaseFold(Func):
+    function = 'CASEFOLD'
+    output_field = CharField()
+
+
+def _contains(queryset, fields, phrases):
+    """
+    Каждая фраза входит в одно из полей без учёта регистра — поиск подстроки без индекса.
+    """
+    if connections[queryset.db].vendor == 'sqlite':
+        folded = {f'{field}_casefold': CaseFold(field) for field in fields}
+        queryset = queryset.alias(**folded)
+        fields, lookup = list(folded), 'contains'
+        phrases = [phrase.casefold() for phrase in phrases]
+    else:
+        lookup = 'icontains'
+    for phrase in phrases:
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__{lookup}': phrase})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def _filter(queryset, phrases, rank):
+    model = queryset.model
+    fields = FULLTEXT_FIELDS[model]
+    if connections[queryset.db].vendor == 'sqlite':
+        indexed = [phrase for phrase in phrases if len(phrase) >= MIN_TERM_LENGTH]
+    else:
+        indexed = []
+    # Короткие фрагменты (например, номер дома) и другие СУБД — обычный поиск подстроки
+    short = [phrase for phrase in phrases if phrase not in indexed]
+    if short:
+        queryset = _contains(queryset, fields, short)
+    if not indexed:
+        return queryset
+
+    expression = ' AND '.join('"%s"' % phrase.replace('"', '""') for phrase in indexed)
+    # Соединение с таблицей FTS5 через неуправляемую модель (ClientFulltext и др.):
+    # BM25 (столбец rank) доступен только в запросе с MATCH по ней и так считается за один проход индекса
+    queryset = queryset.filter(fulltext__document__match=expression)
+    if not rank:
+        return queryset
+    return queryset.annotate(search_rank=F('fulltext__rank')).order_by('search_rank', 'pk')
+
+
+def search(queryset, query):
+    """
+    Полнотекстовый поиск (?q=): каждое слово запроса должно входить в одно из полей
+    FULLTEXT_FIELDS без учёта регистра, в том числе для кириллицы. Результаты упорядочены
+    по BM25, лучшие совпадения первыми; при постраничной выдаче (cursor, page_size) — по id.
+    """
+    return _filter(queryset, query.split(), rank=True)
+
+
+def contains(queryset, value):
+    """
+    Записи, у которых value входит в одно из полей FULLTEXT_FIELDS, — как OR из icontains,
+    но по индексу FTS5 и без учёта регистра, в том числе для кириллицы.
+    """
+    return _filter(queryset, [value], rank=False)
@@ -0,0 +1,254 @@
+import math
+import threading
+
+import numpy as np
+import shapely
+from django.db import DEFAULT_DB_ALIAS, transaction
+from geopy.distance import geodesic
+from shapely.geometry import box
+
+from .models import Property
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+# Запас на расхождение сферической (haversine) и эллипсоидальной (geodesic) дистанций
+HAVERSINE_SLACK = 1.006
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """
+    Векторизованное расстояние по сфере от одной точки до массива точек, в километрах.
+    """
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def filter_inside(polygon, properties):
+    """
+    Оставляет объекты, координаты которых лежат внутри полигона, одной векторной проверкой.
+    """
+    if not properties:
+        return properties
+    inside = shapely.contains_xy(
+        polygon,
+        [property.latitude for property in properties],
+        [property.longitude for property in properties],
+    )
+    return [property for property, is_inside in zip(properties, inside) if is_inside]
+
+
+class GridIndex:
+    """
+    Сеточный пространственный индекс координат объектов недвижимости.
+    Точки раскладываются по ячейкам размером cell_size градусов, поэтому
+    индекс можно обновлять поточечно при сохранении и удалении объектов.
+    Хранится в памяти процесса на тех же условиях, что и индексы из api/search.py.
+    """
+
+    def __init__(self, model, cell_size=0.05):
+        self.model = model
+        self.cell_size = cell_size
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._points = {}
+        self._cells = {}
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def _put(self, pk, latitude, longitude):
+        self._discard(pk)
+        if latitude is None or longitude is None:
+            return
+        self._points[pk] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), {})[pk] = (latitude, longitude)
+
+    def _discard(self, pk):
+        point = self._points.pop(pk, None)
+        if point is None:
+            return
+        key = self._cell(*point)
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.pop(pk, None)
+            if not bucket:
+                del self._cells[key]
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            # Индекс догоняют сигналы записей в основную базу, поэтому и строится он по ней, а не по реплике
+            self._points = {}
+            self._cells = {}
+            rows = (
+                self.model.objects.using(DEFAULT_DB_ALIAS)
+                .filter(latitude__isnull=False, longitude__isnull=False)
+                .values_list('pk', 'latitude', 'longitude')
+                .iterator(chunk_size=5000)
+            )
+            for pk, latitude, longitude in rows:
+                self._put(pk, latitude, longitude)
+            self._loaded = True
+
+    def _add(self, pk, latitude, longitude):
+        with self._lock:
+            if self._loaded:
+                self._put(pk, latitude, longitude)
+
+    def _remove(self, pk):
+        with self._lock:
+            if self._loaded:
+                self._discard(pk)
+
+    def update(self, instance):
+        """
+        Обновляет координаты объекта после фиксации транзакции.
+        """
+        pk, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+        transaction.on_commit(lambda: self._add(pk, latitude, longitude))
+
+    def remove(self, instance):
+        """
+        Удаляет объект из индекса после фиксации транзакции.
+        """
+        pk = instance.pk
+        transaction.on_commit(lambda: self._remove(pk))
+
+    def reset(self):
+        """
+        Сбрасывает индекс; он будет перестроен при следующем запросе.
+        """
+        with self._lock:
+            self._loaded = False
+            self._points = {}
+            self._cells = {}
+
+    def _cells_in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        low_i, low_j = self._cell(min_lat, min_lon)
+        high_i, high_j = self._cell(max_lat, max_lon)
+        cell_count = (high_i - low_i + 1) * (high_j - low_j + 1)
+
+        # Для больших областей дешевле перебрать только занятые ячейки
+        if cell_count > len(self._cells):
+            for (i, j), bucket in self._cells.items():
+                if low_i <= i <= high_i and low_j <= j <= high_j:
+                    yield (i, j), bucket
+            return
+
+        for i in range(low_i, high_i + 1):
+            for j in range(low_j, high_j + 1):
+                bucket = self._cells.get((i, j))
+                if bucket:
+                    yield (i, j), bucket
+
+    def _cell_box(self, i, j):
+        return box(
+            i * self.cell_size, j * self.cell_size,
+            (i + 1) * self.cell_size, (j + 1) * self.cell_size,
+        )
+
+    def in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Возвращает массивы (id, широты, долготы) точек внутри прямоугольника.
+        """
+        self._ensure_loaded()
+        pks, latitudes, longitudes = [], [], []
+        with self._lock:
+            for _, bucket in self._cells_in_bbox(min_lat, min_lon, max_lat, max_lon):
+                for pk, (latitude, longitude) in bucket.items():
+                    pks.append(pk)
+                    latitudes.append(latitude)
+                    longitudes.append(longitude)
+
+        pks = np.array(pks, dtype=np.int64)
+        latitudes = np.array(latitudes, dtype=np.float64)
+        longitudes = np.array(longitudes, dtype=np.float64)
+        inside = (
+            (latitudes >= min_lat) & (latitudes <= max_lat) &
+            (longitudes >= min_lon) & (longitudes <= max_lon)
+        )
+        return pks[inside], latitudes[inside], longitudes[inside]
+
+    def within_polygon(self, polygon):
+        """
+        Возвращает отсортированный список id точек внутри полигона.
+        Полигон задаётся в координатах (широта, долгота).
+        """
+        self._ensure_loaded()
+        shapely.prepare(polygon)
+        min_lat, min_lon, max_lat, max_lon = polygon.bounds
+
+        result = []
+        boundary_pks, boundary_lats, boundary_lons = [], [], []
+        with self._lock:
+            for (i, j), bucket in self._cells_in_bbox(min_lat, min_lon, max_lat, max_lon):
+                # Ячейка целиком внутри полигона — точки можно не проверять
+                if shapely.contains_properly(polygon, self._cell_box(i, j)):
+                    result.extend(bucket)
+                    continue
+                for pk, (latitude, longitude) in bucket.items():
+                    boundary_pks.append(pk)
+                    boundary_lats.append(latitude)
+                    boundary_lons.append(longitude)
+
+        if boundary_pks:
+            inside = shapely.contains_xy(polygon, np.array(boundary_lats), np.array(boundary_lons))
+            result.extend(np.array(boundary_pks, dtype=np.int64)[inside].tolist())
+        return sorted(result)
+
+    def nearby(self, latitude, longitude, radius_km, k):
+        """
+        Возвращает до k пар (id, расстояние в км) в пределах radius_km, по возрастанию расстояния.
+        Отбор идёт по прямоугольнику и haversine, geodesic считается только для итоговых k точек.
+        """
+        search_radius = radius_km * HAVERSINE_SLACK
+        delta_lat = search_radius / KM_PER_DEGREE
+        min_lat, max_lat = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+
+        cos_lat = math.cos(math.radians(latitude))
+        delta_lon = search_radius / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+        if delta_lon >= 180.0 or min_lat == -90.0 or max_lat == 90.0:
+            ranges = [(-180.0, 180.0)]
+        else:
+            min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+            ranges = [(max(min_lon, -180.0), min(max_lon, 180.0))]
+            # Прямоугольник пересекает 180-й меридиан
+            if min_lon < -180.0:
+                ranges.append((min_lon + 360.0, 180.0))
+            if max_lon > 180.0:
+                ranges.append((-180.0, max_lon - 360.0))
+
+        parts = [self.in_bbox(min_lat, low, max_lat, high) for low, high in ranges]
+        pks = np.concatenate([part[0] for part in parts])
+        latitudes = np.concatenate([part[1] for part in parts])
+        longitudes = np.concatenate([part[2] for part in parts])
+
+        distances = haversine_km(latitude, longitude, latitudes, longitudes)
+        within = distances <= search_radius
+        pks, latitudes, longitudes, distances = pks[within], latitudes[within], longitudes[within], distances[within]
+
+        if k < len(pks):
+            top = np.argpartition(distances, k - 1)[:k]
+            pks, latitudes, longitudes = pks[top], latitudes[top], longitudes[top]
+
+        result = []
+        for pk, point_lat, point_lon in zip(pks.tolist(), latitudes.tolist(), longitudes.tolist()):
+            distance = geodesic((latitude, longitude), (point_lat, point_lon)).km
+            if distance <= radius_km:
+                result.append((pk, distance))
+        result.sort(key=lambda item: (item[1], item[0]))
+        return result
+
+
+property_grid_index = GridIndex(Property)
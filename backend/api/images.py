@@ -0,0 +1,106 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .caching import bump_generation
+from .models import Property
+
+logger = logging.getLogger(__name__)
+
+# Вариант -> наибольшая сторона в пикселях
+VARIANTS = {
+    'thumb': 320,
+    'medium': 1280,
+}
+WEBP_QUALITY = 80
+VARIANTS_DIR = 'property_images/variants'
+
+_storage = Property._meta.get_field('image').storage
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+    thread_name_prefix='image-variants',
+)
+
+
+def render_variants(source):
+    """
+    Строит WebP-копии изображения для всех VARIANTS и сохраняет их в хранилище.
+    Имена файлов содержат хеш исходного содержимого, поэтому готовые копии не пересоздаются.
+    Возвращает словарь вариант -> имя файла.
+    """
+    with _storage.open(source, 'rb') as file:
+        content = file.read()
+    digest = hashlib.sha256(content).hexdigest()[:20]
+
+    names = {}
+    image = None
+    try:
+        for variant, size in VARIANTS.items():
+            name = f'{VARIANTS_DIR}/{digest}_{variant}.webp'
+            if not _storage.exists(name):
+                if image is None:
+                    image = ImageOps.exif_transpose(Image.open(io.BytesIO(content)))
+                    image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+                resized = image.copy()
+                resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+                name = _storage.save(name, ContentFile(buffer.getvalue()))
+            names[variant] = name
+    finally:
+        if image is not None:
+            image.close()
+    return names
+
+
+def _generate(pk, source):
+    try:
+        variants = render_variants(source)
+        # Изображение могли заменить, пока строились копии, — тогда запись не трогаем
+        updated = Property.objects.filter(pk=pk, image=source).update(
+            image_variants={'source': source, **variants},
+        )
+        if updated:
+            bump_generation(Property)
+    except Exception:
+        logger.exception("Не удалось построить копии изображения %s объекта %s", source, pk)
+        raise
+    finally:
+        connections.close_all()
+
+
+def generate_variants(property):
+    """
+    Ставит построение копий изображения объекта в фоновый пул и возвращает Future.
+    """
+    return _executor.submit(_generate, property.pk, property.image.name)
+
+
+def needs_variants(property):
+    return bool(property.image) and property.image_variants.get('source') != property.image.name
+
+
+def schedule_variants(property):
+    """
+    После фиксации транзакции отправляет новое изображение объекта в фоновый пул,
+    чтобы не задерживать запрос загрузки.
+    """
+    if needs_variants(property):
+        pk, source = property.pk, property.image.name
+        transaction.on_commit(lambda: _executor.submit(_generate, pk, source))
+
+
+def variant_urls(property):
+    """
+    URL готовых копий изображения; пока копии строятся, словарь пуст.
+    """
+    if not property.image or needs_variants(property):
+        return {}
+    variants = property.image_variants
+    return {variant: _storage.url(variants[variant]) for variant in VARIANTS if variant in variants}
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client as HttpClient
+from django.utils import timezone
+
+from api.models import Act
+
+# Профиль по умолчанию Django: журнал отката, новое соединение на запрос, DEFERRED-транзакции
+BASELINE_PROFILE = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Многопоточный замер чтения и записи через реальные эндпоинты API на копии базы: "
+        "профиль SQLite по умолчанию (baseline) против настроек из settings.DATABASES (production)."
+    )
+
+    READ_ENDPOINTS = [
+        '/api/clients/?page_size=20',
+        '/api/offers/?page_size=20',
+        '/api/needs/?page_size=20',
+        '/api/acts/',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=6, help="Потоков чтения.")
+        parser.add_argument('--writers', type=int, default=4, help="Потоков записи.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Длительность замера каждого профиля.")
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("Замер предназначен для SQLite.")
+
+        production = {
+            'CONN_MAX_AGE': database.get('CONN_MAX_AGE', 0),
+            'OPTIONS': dict(database.get('OPTIONS', {})),
+        }
+        self.stdout.write(f"{'профиль':<12}{'чтений/с':>12}{'записей/с':>12}{'ошибок':>10}")
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in (('baseline', BASELINE_PROFILE), ('production', production)):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self._copy_database(database['NAME'], path)
+                results[name] = self._run(path, profile, options)
+                reads, writes, errors = results[name]
+                self.stdout.write(f"{name:<12}{reads:>12.1f}{writes:>12.1f}{errors:>10}")
+
+        baseline, tuned = results['baseline'], results['production']
+        if baseline[1]:
+            self.stdout.write(self.style.SUCCESS(f"Ускорение записи: x{tuned[1] / baseline[1]:.1f}"))
+
+    def _copy_database(self, source, target):
+        # Резервная копия через sqlite3 согласована даже при работающем приложении
+        with sqlite3.connect(source) as source_connection, sqlite3.connect(target) as target_connection:
+            source_connection.backup(target_connection)
+        source_connection.close()
+        target_connection.close()
+
+    def _configure(self, path, profile):
+        connections.close_all()
+        database = connections.settings['default']
+        database['NAME'] = path
+        database['CONN_MAX_AGE'] = profile['CONN_MAX_AGE']
+        database['OPTIONS'] = dict(profile['OPTIONS'])
+
+    def _run(self, path, profile, options):
+        original = dict(connections.settings['default'])
+        self._configure(path, profile)
+        counters = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def count(name):
+            with lock:
+                counters[name] += 1
+
+        def reader(number):
+            client = HttpClient()
+            while time.monotonic() < deadline:
+                url = self.READ_ENDPOINTS[number % len(self.READ_ENDPOINTS)]
+                number += 1
+                self._request(count, 'reads', lambda: client.get(url))
+
+        def writer(number):
+            client = HttpClient()
+            sequence = 0
+            while time.monotonic() < deadline:
+                sequence += 1
+                if sequence % 2:
+                    data = {'first_name': 'Тест', 'last_name': f'Замер{number}', 'phone': f'{number}-{sequence}'}
+                    self._request(count, 'writes', lambda: client.post('/api/clients/', data, content_type='application/json'))
+                else:
+                    data = {
+                        'date_time': timezone.now().isoformat(),
+                        'duration': '00:30:00',
+                        'act_type': Act.ACT_TYPES[0][0],
+                        'comment': 'benchmark',
+                    }
+                    self._request(count, 'writes', lambda: client.post('/api/acts/', data, content_type='application/json'))
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(options['writers'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        connections.close_all()
+        connections.settings['default'].clear()
+        connections.settings['default'].update(original)
+        return counters['reads'] / elapsed, counters['writes'] / elapsed, counters['errors']
+
+    @staticmethod
+    def _request(count, name, send):
+        try:
+            response = send()
+        except OperationalError:
+            # "database is locked" после истечения busy_timeout
+            count('errors')
+            return
+        finally:
+            # Каждый поток тестового клиента держит своё соединение; закрываем его по правилам CONN_MAX_AGE
+            for connection in connections.all(initialized_only=True):
+                connection.close_if_unusable_or_obsolete()
+        count(name if response.status_code < 400 else 'errors')
@@ -0,0 +1,69 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from api.matching import needs_for_offer_filter, offers_for_need_filter
+from api.models import Act, Match, Need, Offer, Property, PropertyType
+
+
+class Command(BaseCommand):
+    help = (
+        "Выводит EXPLAIN QUERY PLAN для запросов горячих эндпоинтов и завершается с ошибкой, "
+        "если какой-либо из них читает таблицу полным сканированием."
+    )
+
+    def hot_queries(self):
+        """
+        Запросы в том виде, в котором их строят эндпоинты.
+        """
+        property = Property(property_type=PropertyType.APARTMENT, area=50, rooms=2, floor=3)
+        offer = Offer(pk=1, price=5_000_000, property=property)
+        need = Need(
+            pk=1, property_type=PropertyType.APARTMENT, min_price=4_000_000, max_price=6_000_000,
+            min_area=40, max_area=60,
+        )
+        start = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+        return {
+            'offers/<id>/matching-needs (подбор)': Need.objects.filter(needs_for_offer_filter(offer)),
+            'needs/<id>/matching-offers (подбор)': Offer.objects.filter(offers_for_need_filter(need)),
+            'offers/<id>/matching-needs': Need.objects.filter(matches__offer=offer),
+            'needs/<id>/matching-offers': Offer.objects.filter(matches__need=need),
+            'properties/?property_type=': Property.objects.filter(property_type=PropertyType.HOUSE),
+            'properties/search_in_region': Property.objects.filter(
+                latitude__range=(55.5, 56.0), longitude__range=(37.3, 37.9),
+            ),
+            'acts (сегодня)': Act.objects.starting_between(start, start + datetime.timedelta(days=1)),
+            'acts/conflicts': Act.objects.filter(
+                date_time__gt=start - datetime.timedelta(hours=2), date_time__lt=start,
+            ),
+            'acts/conflicts (максимальная длительность)': Act.objects.order_by('-duration')[:1],
+            'matches/counts': Match.objects.filter(offer_id=1),
+        }
+
+    @staticmethod
+    def full_scans(plan):
+        """
+        Строки плана с полным сканированием таблицы (SCAN без использования индекса).
+        """
+        return [
+            line for line in plan.splitlines()
+            if 'SCAN ' in line and 'USING' not in line and 'CONSTANT ROW' not in line
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Проверка рассчитана на план запросов SQLite.")
+
+        failed = []
+        for name, queryset in self.hot_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if self.full_scans(plan):
+                failed.append(name)
+
+        if failed:
+            raise CommandError(f"Полное сканирование таблицы: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Все горячие запросы используют индексы."))
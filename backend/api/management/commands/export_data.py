@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.transfer import CONTENT_TYPES, DATASETS, export_chunks, guess_format
+
+
+class Command(BaseCommand):
+    help = "Потоково выгружает набор данных в CSV или JSONL с постоянным расходом памяти."
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('--output', help="Файл для записи; по умолчанию stdout.")
+        parser.add_argument(
+            '--format', dest='file_format', choices=CONTENT_TYPES,
+            help="Формат файла; по умолчанию определяется по расширению --output, иначе CSV.",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or guess_format(options['output'] or '')
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in export_chunks(DATASETS[options['dataset']], file_format):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
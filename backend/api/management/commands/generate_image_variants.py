@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants, needs_variants
+from api.models import Property
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные WebP-копии изображений объектов, у которых их ещё нет "
+        "(загруженных до появления копий или импортированных в обход сигналов)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Обработать все изображения, а не только без копий (например, после удаления файлов копий).")
+
+    def handle(self, *args, **options):
+        properties = Property.objects.exclude(image='').exclude(image__isnull=True).only('image', 'image_variants')
+        futures = [
+            generate_variants(property)
+            for property in properties.iterator(chunk_size=2000)
+            if options['force'] or needs_variants(property)
+        ]
+
+        failed = 0
+        for future in futures:
+            if future.exception() is not None:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Обработано изображений: {len(futures) - failed}, с ошибками: {failed}"))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.transfer import CONTENT_TYPES, DATASETS, ON_CONFLICT, Importer, guess_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково загружает набор данных из CSV или JSONL пакетами bulk_create. "
+        "Каждый пакет фиксируется отдельно, поэтому прерванную загрузку можно повторить "
+        "с --on-conflict ignore или update."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('path', help="Файл CSV (первая строка — заголовок) или JSONL.")
+        parser.add_argument(
+            '--format', dest='file_format', choices=CONTENT_TYPES,
+            help="Формат файла; по умолчанию определяется по расширению.",
+        )
+        parser.add_argument(
+            '--on-conflict', choices=ON_CONFLICT, default='ignore',
+            help="Что делать со строками, id которых уже есть в базе: пропустить или перезаписать.",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Строк в одном пакете.")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or guess_format(options['path'])
+        importer = Importer(
+            DATASETS[options['dataset']],
+            on_conflict=options['on_conflict'],
+            batch_size=options['batch_size'],
+            progress=self._progress,
+        )
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                summary = importer.run(read_rows(stream, file_format))
+        except (OSError, IntegrityError) as error:
+            raise CommandError(error)
+
+        for error in summary['errors']:
+            self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано строк: {summary['processed']}, записано: {summary['written']}, "
+            f"пропущено: {summary['skipped']}, с ошибками: {summary['error_count']}"
+        ))
+
+    def _progress(self, processed, written, errors):
+        self.stderr.write(f"Обработано строк: {processed}, записано: {written}, с ошибками: {errors}")
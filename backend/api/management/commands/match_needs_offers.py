@@ -0,0 +1,42 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.matching import iter_matches
+from api.models import Need, Offer, PropertyType
+
+
+class Command(BaseCommand):
+    help = "Выгружает в CSV все совместимые пары потребность — предложение (need_id, offer_id)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Файл для записи CSV; по умолчанию stdout.")
+        parser.add_argument('--property-type', choices=PropertyType.values, help="Только указанный тип недвижимости.")
+        parser.add_argument('--available', action='store_true', help="Только потребности и предложения вне сделок.")
+
+    def handle(self, *args, **options):
+        needs = Need.objects.all()
+        offers = Offer.objects.all()
+
+        if options['property_type']:
+            needs = needs.filter(property_type=options['property_type'])
+            offers = offers.filter(property__property_type=options['property_type'])
+
+        if options['available']:
+            needs = needs.filter(is_active=True)
+            offers = offers.filter(is_active=True)
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(['need_id', 'offer_id'])
+            count = 0
+            for need_id, offer_id in iter_matches(needs, offers):
+                writer.writerow([need_id, offer_id])
+                count += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.stderr.write(f"Найдено пар: {count}")
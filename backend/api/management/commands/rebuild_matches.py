@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.matching import rebuild_matches
+
+
+class Command(BaseCommand):
+    help = (
+        "Полностью перестраивает таблицу совпадений потребностей и предложений. "
+        "Нужна после массовых изменений в обход сигналов (bulk_create, update, импорт)."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_matches()
+        self.stdout.write(self.style.SUCCESS(f"Совпадений записано: {count}"))
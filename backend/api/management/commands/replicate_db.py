@@ -0,0 +1,47 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import PRIMARY_ALIAS, REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Копирует основную базу SQLite в реплику для чтения через backup API: копия согласована "
+        "и пишется на месте, поэтому открытые соединения реплики сразу видят новые данные."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help="Повторять копирование каждые N секунд; без параметра — один раз.",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections.settings:
+            raise CommandError("Реплика не настроена: задайте переменную окружения DJANGO_DB_REPLICA.")
+        primary = connections.settings[PRIMARY_ALIAS]
+        replica = connections.settings[REPLICA_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != primary['ENGINE']:
+            raise CommandError("Команда поддерживает только SQLite.")
+
+        while True:
+            started = time.monotonic()
+            self._copy(primary, replica)
+            self.stdout.write(f"Реплика обновлена за {time.monotonic() - started:.2f} с")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def _copy(primary, replica):
+        timeout = primary.get('OPTIONS', {}).get('timeout', 20)
+        source = sqlite3.connect(primary['NAME'], timeout=timeout)
+        target = sqlite3.connect(replica['NAME'], timeout=timeout)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
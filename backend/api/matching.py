@@ -0,0 +1,201 @@
+import numpy as np
+from django.db.models import Max, Min, Q
+
+from .models import Match, Need, Offer
+
+# Характеристики объекта, для которых в потребности задаётся диапазон min_<поле>..max_<поле>
+RANGE_FIELDS = ('area', 'rooms', 'floor', 'floors')
+
+NEED_COLUMNS = ('id', 'property_type', 'min_price', 'max_price') + tuple(
+    f'{bound}_{field}' for field in RANGE_FIELDS for bound in ('min', 'max')
+)
+OFFER_COLUMNS = ('id', 'property__property_type', 'price') + tuple(
+    f'property__{field}' for field in RANGE_FIELDS
+)
+
+
+def offers_for_need_filter(need):
+    """
+    Условие на предложения, подходящие потребности.
+    Незаполненная граница диапазона не ограничивает выбор; если граница задана,
+    у объекта должна быть заполнена соответствующая характеристика.
+    """
+    condition = Q(
+        property__property_type=need.property_type,
+        price__gte=need.min_price,
+        price__lte=need.max_price,
+    )
+    for field in RANGE_FIELDS:
+        min_value = getattr(need, f'min_{field}')
+        max_value = getattr(need, f'max_{field}')
+        if min_value is not None:
+            condition &= Q(**{f'property__{field}__gte': min_value})
+        if max_value is not None:
+            condition &= Q(**{f'property__{field}__lte': max_value})
+    return condition
+
+
+def needs_for_offer_filter(offer):
+    """
+    Условие на потребности, которым подходит предложение (обратное к offers_for_need_filter).
+    """
+    property = offer.property
+    condition = Q(
+        property_type=property.property_type,
+        min_price__lte=offer.price,
+        max_price__gte=offer.price,
+    )
+    for field in RANGE_FIELDS:
+        value = getattr(property, field)
+        if value is None:
+            condition &= Q(**{f'min_{field}__isnull': True, f'max_{field}__isnull': True})
+        else:
+            condition &= Q(**{f'min_{field}__lte': value}) | Q(**{f'min_{field}__isnull': True})
+            condition &= Q(**{f'max_{field}__gte': value}) | Q(**{f'max_{field}__isnull': True})
+    return condition
+
+
+class _OfferTable:
+    """
+    Предложения одного типа недвижимости, отсортированные по цене.
+    Незаполненные характеристики хранятся как NaN и не проходят ни одну заданную границу.
+    """
+
+    def __init__(self, rows):
+        rows.sort(key=lambda row: row[2])
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.prices = np.array([row[2] for row in rows], dtype=np.int64)
+        self.values = {
+            field: np.array(
+                [np.nan if row[3 + i] is None else row[3 + i] for row in rows],
+                dtype=np.float64,
+            )
+            for i, field in enumerate(RANGE_FIELDS)
+        }
+
+    def match(self, need):
+        """
+        Возвращает массив id предложений, подходящих потребности.
+        need — кортеж значений в порядке NEED_COLUMNS.
+        """
+        # Окно по цене находится бинарным поиском, остальные диапазоны проверяются векторно
+        start = np.searchsorted(self.prices, need[2], side='left')
+        stop = np.searchsorted(self.prices, need[3], side='right')
+        if start >= stop:
+            return self.ids[:0]
+
+        mask = np.ones(stop - start, dtype=bool)
+        for i, field in enumerate(RANGE_FIELDS):
+            min_value, max_value = need[4 + 2 * i], need[5 + 2 * i]
+            if min_value is None and max_value is None:
+                continue
+            values = self.values[field][start:stop]
+            if min_value is not None:
+                mask &= values >= min_value
+            if max_value is not None:
+                mask &= values <= max_value
+        return self.ids[start:stop][mask]
+
+
+def iter_matches(needs=None, offers=None):
+    """
+    Находит все совместимые пары (id потребности, id предложения) за один проход.
+    Предложения загружаются один раз и группируются по типу недвижимости,
+    после чего каждая потребность проверяется по отсортированным массивам своего типа.
+    """
+    if needs is None:
+        needs = Need.objects.all()
+    if offers is None:
+        offers = Offer.objects.all()
+
+    grouped = {}
+    for row in offers.values_list(*OFFER_COLUMNS).iterator(chunk_size=5000):
+        grouped.setdefault(row[1], []).append(row)
+    tables = {property_type: _OfferTable(rows) for property_type, rows in grouped.items()}
+
+    for need in needs.values_list(*NEED_COLUMNS).order_by('id').iterator(chunk_size=5000):
+        table = tables.get(need[1])
+        if table is None:
+            continue
+        for offer_id in np.sort(table.match(need)).tolist():
+            yield need[0], offer_id
+
+
+def refresh_offer_matches(offer):
+    """
+    Пересчитывает совпадения предложения: проверяются только потребности
+    того же типа, в ценовой диапазон которых попадает предложение.
+    Пару может одновременно вставить пересчёт её потребности, поэтому
+    существующие пары пропускаются (ignore_conflicts), а не роняют запись.
+    """
+    Match.objects.filter(offer=offer).delete()
+    need_ids = Need.objects.filter(needs_for_offer_filter(offer)).values_list('id', flat=True)
+    Match.objects.bulk_create([Match(need_id=need_id, offer=offer) for need_id in need_ids], ignore_conflicts=True)
+
+
+def refresh_need_matches(need):
+    """
+    Пересчитывает совпадения потребности.
+    """
+    Match.objects.filter(need=need).delete()
+    offer_ids = Offer.objects.filter(offers_for_need_filter(need)).values_list('id', flat=True)
+    Match.objects.bulk_create([Match(need=need, offer_id=offer_id) for offer_id in offer_ids], ignore_conflicts=True)
+
+
+def refresh_property_matches(property):
+    """
+    Пересчитывает совпадения всех предложений по объекту недвижимости.
+    """
+    for offer in Offer.objects.filter(property=property).select_related('property'):
+        refresh_offer_matches(offer)
+
+
+def _insert_matches(match_model, pairs, batch_size):
+    batch = []
+    count = 0
+    for need_id, offer_id in pairs:
+        batch.append(match_model(need_id=need_id, offer_id=offer_id))
+        if len(batch) == batch_size:
+            match_model.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+            batch = []
+    match_model.objects.bulk_create(batch, ignore_conflicts=True)
+    return count + len(batch)
+
+
+def refresh_batch_matches(need_ids=None, offer_ids=None, batch_size=5000):
+    """
+    Пересчитывает совпадения пакета потребностей (need_ids) или предложений (offer_ids)
+    одним проходом iter_matches. Другая сторона ограничивается типами недвижимости
+    и общим ценовым окном пакета, поэтому читается по индексу, а не целиком.
+    """
+    if offer_ids is not None:
+        if not offer_ids:
+            return 0
+        offers = Offer.objects.filter(pk__in=offer_ids)
+        window = offers.aggregate(low=Min('price'), high=Max('price'))
+        types = offers.values_list('property__property_type', flat=True).distinct()
+        needs = Need.objects.filter(
+            property_type__in=types, min_price__lte=window['high'], max_price__gte=window['low'],
+        )
+        Match.objects.filter(offer_id__in=offer_ids).delete()
+    else:
+        if not need_ids:
+            return 0
+        needs = Need.objects.filter(pk__in=need_ids)
+        window = needs.aggregate(low=Min('min_price'), high=Max('max_price'))
+        types = needs.values_list('property_type', flat=True).distinct()
+        offers = Offer.objects.filter(
+            property__property_type__in=types, price__range=(window['low'], window['high']),
+        )
+        Match.objects.filter(need_id__in=need_ids).delete()
+    return _insert_matches(Match, iter_matches(needs, offers), batch_size)
+
+
+def rebuild_matches(match_model=Match, needs=None, offers=None, batch_size=5000):
+    """
+    Полностью перестраивает таблицу совпадений пакетным подбором.
+    Модели можно передать явно (например, исторические модели из миграции).
+    """
+    match_model.objects.all().delete()
+    return _insert_matches(match_model, iter_matches(needs, offers), batch_size)
@@ -0,0 +1,143 @@
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Имена по хешу содержимого (property_image_upload_to, копии из api/images.py) никогда
+# не указывают на другие данные, поэтому такие файлы кэшируются бессрочно
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{20}(_[a-z]+)?\.[0-9a-z]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Прочие файлы кэшируются, но каждый раз перепроверяются по ETag (ответ 304 без тела)
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+class _UnsatisfiableRange(Exception):
+    pass
+
+
+def _parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном и возвращает (start, end) включительно.
+    Некорректный заголовок и несколько диапазонов игнорируются (None — отдать файл целиком),
+    диапазон за пределами файла — _UnsatisfiableRange.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None or size == 0:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # bytes=-N — последние N байт
+        length = int(last)
+        if length == 0:
+            raise _UnsatisfiableRange()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise _UnsatisfiableRange()
+    return start, end
+
+
+def _iter_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Отдаёт файл из MEDIA_ROOT: целиком через FileResponse (wsgi.file_wrapper, sendfile
+    у gunicorn/uwsgi) или по Range одним диапазоном; поддерживает If-None-Match,
+    If-Modified-Since и If-Range. При заданном MEDIA_ACCEL_REDIRECT передача файла
+    поручается nginx через X-Accel-Redirect.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+    try:
+        file_stat = os.stat(full_path)
+    except OSError:
+        raise Http404()
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404()
+
+    size = file_stat.st_size
+    last_modified = int(file_stat.st_mtime)
+    # Сильный ETag: меняется при любой перезаписи файла
+    etag = '"%s"' % hashlib.md5(
+        f'{file_stat.st_ino}-{file_stat.st_mtime_ns}-{size}'.encode()
+    ).hexdigest()
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if HASHED_NAME_RE.match(os.path.basename(full_path))
+        else REVALIDATE_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        for name, value in headers.items():
+            conditional[name] = value
+        return conditional
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(path.lstrip('/'))
+        return response
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or if_range in (etag, headers['Last-Modified'])):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except _UnsatisfiableRange:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['Content-Length'] = size
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _iter_range(open(full_path, 'rb'), start, end - start + 1),
+        status=206, content_type=content_type, headers=headers,
+    )
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
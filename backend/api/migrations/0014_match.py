@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_matches(apps, schema_editor):
+    from api.matching import rebuild_matches
+
+    Match = apps.get_model('api', 'Match')
+    Need = apps.get_model('api', 'Need')
+    Offer = apps.get_model('api', 'Offer')
+    rebuild_matches(Match, Need.objects.all(), Offer.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_property_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Match',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('need', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='api.need')),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='api.offer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['offer', 'need'], name='match_offer_need_idx')],
+                'constraints': [models.UniqueConstraint(fields=('need', 'offer'), name='unique_match')],
+            },
+        ),
+        migrations.RunPython(populate_matches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_match'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='act',
+            index=models.Index(fields=['date_time'], name='act_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='need',
+            index=models.Index(fields=['property_type', 'min_price', 'max_price'], name='need_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['price'], name='offer_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['property_type', 'area'], name='property_type_area_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+def mark_deal_participants(apps, schema_editor):
+    Need = apps.get_model('api', 'Need')
+    Offer = apps.get_model('api', 'Offer')
+    Need.objects.filter(deal__isnull=False).update(is_active=False)
+    Offer.objects.filter(deal__isnull=False).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='need',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+        migrations.RunPython(mark_deal_participants, migrations.RunPython.noop),
+    ]
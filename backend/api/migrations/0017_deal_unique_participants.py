@@ -0,0 +1,54 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:04
+
+from django.db import IntegrityError, migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_participants(apps, schema_editor):
+    """
+    Прежнее ограничение было только на пару (need, offer), поэтому гонка при создании сделок
+    могла оставить одну потребность или одно предложение в нескольких сделках.
+    """
+    Deal = apps.get_model('api', 'Deal')
+    deals = Deal.objects.using(schema_editor.connection.alias)
+    problems = []
+    for field in ('need', 'offer'):
+        duplicates = list(
+            deals.values(f'{field}_id').annotate(count=Count('id')).filter(count__gt=1)
+            .values_list(f'{field}_id', flat=True)
+        )
+        if duplicates:
+            problems.append(f'{field} id {", ".join(map(str, duplicates))}')
+    if problems:
+        raise IntegrityError(
+            'Найдены сделки с одинаковыми участниками (' + '; '.join(problems) + '). '
+            'Оставьте по одной сделке на потребность и предложение и повторите миграцию.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_is_active'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='deal',
+            name='unique_deal',
+        ),
+        migrations.AddField(
+            model_name='deal',
+            name='request_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(check_duplicate_participants, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='deal',
+            constraint=models.UniqueConstraint(fields=('need',), name='unique_deal_need'),
+        ),
+        migrations.AddConstraint(
+            model_name='deal',
+            constraint=models.UniqueConstraint(fields=('offer',), name='unique_deal_offer'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_deal_unique_participants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
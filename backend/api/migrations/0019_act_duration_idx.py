@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_deal_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='act',
+            index=models.Index(fields=['duration'], name='act_duration_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:15
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_act_duration_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=api.models.property_image_upload_to),
+        ),
+    ]
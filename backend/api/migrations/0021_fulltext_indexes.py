@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Таблица модели -> проиндексированные столбцы (на момент миграции)
+INDEXES = {
+    'api_client': ('last_name', 'first_name', 'patronymic'),
+    'api_property': ('city', 'street', 'house_number', 'apartment_number'),
+    'api_need': ('city', 'street', 'house_number', 'apartment_number'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    from api.fulltext import create_index
+
+    for table, columns in INDEXES.items():
+        create_index(schema_editor, table, columns)
+
+
+def drop_indexes(apps, schema_editor):
+    from api.fulltext import drop_index
+
+    for table in INDEXES:
+        drop_index(schema_editor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_property_image_variants'),
+    ]
+
+    # Таблицы FTS5 есть только в SQLite; на других СУБД обе функции ничего не делают,
+    # поэтому миграция применяется и откатывается на любой базе
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
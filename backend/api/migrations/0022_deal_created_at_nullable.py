@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.migrations.recorder import MigrationRecorder
+from django.utils import timezone
+
+BACKFILL_MIGRATION = ('api', '0018_deal_created_at')
+
+
+def _backfill_time(schema_editor):
+    # 0018 заполнил существующие сделки моментом своего применения; сделки,
+    # созданные позже, получили время не раньше записи о применении
+    record = MigrationRecorder(schema_editor.connection).migration_qs.filter(
+        app=BACKFILL_MIGRATION[0], name=BACKFILL_MIGRATION[1],
+    ).first()
+    return record.applied if record is not None else None
+
+
+def clear_backfilled_dates(apps, schema_editor):
+    applied = _backfill_time(schema_editor)
+    if applied is None:
+        return
+    Deal = apps.get_model('api', 'Deal')
+    Deal.objects.using(schema_editor.connection.alias).filter(created_at__lte=applied).update(created_at=None)
+
+
+def restore_backfilled_dates(apps, schema_editor):
+    Deal = apps.get_model('api', 'Deal')
+    Deal.objects.using(schema_editor.connection.alias).filter(created_at__isnull=True).update(
+        created_at=_backfill_time(schema_editor) or timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_fulltext_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deal',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=timezone.now, null=True),
+        ),
+        migrations.RunPython(clear_backfilled_dates, restore_backfilled_dates),
+    ]
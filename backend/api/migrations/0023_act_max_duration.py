@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:39
+
+import datetime
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_deal_created_at_nullable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='act',
+            name='duration',
+            field=models.DurationField(validators=[django.core.validators.MaxValueValidator(datetime.timedelta(days=1))], verbose_name='Длительность события'),
+        ),
+    ]
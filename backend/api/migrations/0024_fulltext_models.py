@@ -0,0 +1,51 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:44
+
+import api.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_act_max_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientFulltext',
+            fields=[
+                ('rank', models.FloatField()),
+                ('client', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fulltext', serialize=False, to='api.client')),
+                ('document', api.models.FulltextDocumentField(db_column='api_client_fts')),
+            ],
+            options={
+                'db_table': 'api_client_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='NeedFulltext',
+            fields=[
+                ('rank', models.FloatField()),
+                ('need', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fulltext', serialize=False, to='api.need')),
+                ('document', api.models.FulltextDocumentField(db_column='api_need_fts')),
+            ],
+            options={
+                'db_table': 'api_need_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyFulltext',
+            fields=[
+                ('rank', models.FloatField()),
+                ('property', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fulltext', serialize=False, to='api.property')),
+                ('document', api.models.FulltextDocumentField(db_column='api_property_fts')),
+            ],
+            options={
+                'db_table': 'api_property_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
+import hashlib
+import os
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.forms import ValidationError
 
@@ -63,6 +66,19 @@ class PropertyType(models.TextChoices):
     LAND = 'Земля', 'Земля'
 
 
+def property_image_upload_to(instance, filename):
+    """
+    Имя загружаемого изображения по хешу содержимого: файл с таким именем
+    никогда не меняется, поэтому его можно кэшировать бессрочно.
+    """
+    digest = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+    instance.image.seek(0)
+    extension = os.path.splitext(filename)[1].lower()
+    return f'property_images/{digest.hexdigest()[:20]}{extension}'
+
+
 class Property(models.Model):
     property_type = models.CharField(
         max_length=10, 
@@ -74,7 +90,10 @@ class Property(models.Model):
     street = models.CharField(max_length=100, blank=True, null=True)
     house_number = models.CharField(max_length=10, blank=True, null=True)
     apartment_number = models.CharField(max_length=10, blank=True, null=True)
-    image = models.ImageField(upload_to='property_images/', blank=True, null=True)
+    image = models.ImageField(upload_to=property_image_upload_to, blank=True, null=True)
+    # Уменьшенные копии изображения: {'source': имя исходного файла, вариант: имя файла},
+    # заполняются фоновым пулом из api/images.py
+    image_variants = models.JSONField(default=dict, blank=True)
     # Координаты
     latitude = models.FloatField(
         blank=True, null=True,
@@ -112,6 +131,10 @@ class Property(models.Model):
     class Meta:
         verbose_name = "Property"
         verbose_name_plural = "Properties"
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='property_lat_lon_idx'),
+            models.Index(fields=['property_type', 'area'], name='property_type_area_idx'),
+        ]
 
 class Offer(models.Model):
     client = models.ForeignKey(
@@ -126,10 +149,12 @@ class Offer(models.Model):
     )
     property = models.ForeignKey(Property, on_delete=models.CASCADE)
     price = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    # Не участвует в сделке; поддерживается при создании и удалении сделок
+    is_active = models.BooleanField(default=True, db_index=True)
 
     # Метод для проверки, участвует ли предложение в сделке
     def is_in_deal(self):
-        return Deal.objects.filter(offer=self).exists()
+        return not self.is_active
 
     def __str__(self):
         return f"Предложение для адреса {self.property.address} от {self.client} с ценной {self.price}"
@@ -138,6 +163,9 @@ class Offer(models.Model):
         constraints = [
             models.CheckConstraint(check=models.Q(price__gt=0), name='offer_price_positive')
         ]
+        indexes = [
+            models.Index(fields=['price'], name='offer_price_idx'),
+        ]
 
 class Need(models.Model):
     client = models.ForeignKey(
@@ -170,9 +198,12 @@ class Need(models.Model):
     min_floors = models.IntegerField(blank=True, null=True)
     max_floors = models.IntegerField(blank=True, null=True)
 
+    # Не участвует в сделке; поддерживается при создании и удалении сделок
+    is_active = models.BooleanField(default=True, db_index=True)
+
     # Метод для проверки, участвует ли потребность в сделке
     def is_in_deal(self):
-        return Deal.objects.filter(need=self).exists()
+        return not self.is_active
 
     def delete(self, *args, **kwargs):
         if self.is_in_deal():
@@ -197,71 +228,153 @@ class Need(models.Model):
             models.CheckConstraint(check=models.Q(min_price__gt=0), name='need_min_price_positive'),
             models.CheckConstraint(check=models.Q(max_price__gt=0), name='need_max_price_positive')
         ]
+        indexes = [
+            models.Index(fields=['property_type', 'min_price', 'max_price'], name='need_type_price_idx'),
+        ]
+
+
+def compute_commissions(price, property_type, seller_realtor_share, buyer_realtor_share):
+    """
+    Рассчитывает комиссии сделки по цене предложения, типу недвижимости
+    и долям риэлторов (при отсутствии доли используется 45%).
+    """
+    price = Decimal(price)
+    seller_realtor_commission_share = Decimal(seller_realtor_share or 45)
+    buyer_realtor_commission_share = Decimal(buyer_realtor_share or 45)
+
+    if property_type == PropertyType.APARTMENT:
+        seller_commission = Decimal(36000) + (Decimal('0.01') * price)
+    elif property_type == PropertyType.LAND:
+        seller_commission = Decimal(30000) + (Decimal('0.02') * price)
+    elif property_type == PropertyType.HOUSE:
+        seller_commission = Decimal(30000) + (Decimal('0.01') * price)
+    else:
+        seller_commission = Decimal(0)
+
+    buyer_commission = Decimal('0.03') * price
+
+    seller_realtor_payment = (seller_commission * seller_realtor_commission_share) / Decimal(100)
+    company_payment_seller = seller_commission - seller_realtor_payment
+
+    buyer_realtor_payment = (buyer_commission * buyer_realtor_commission_share) / Decimal(100)
+    company_payment_buyer = buyer_commission - buyer_realtor_payment
+
+    return {
+        "seller_commission": seller_commission,
+        "buyer_commission": buyer_commission,
+        "seller_realtor_payment": seller_realtor_payment,
+        "company_payment_seller": company_payment_seller,
+        "buyer_realtor_payment": buyer_realtor_payment,
+        "company_payment_buyer": company_payment_buyer
+    }
 
 
 class Deal(models.Model):
     need = models.ForeignKey(Need, on_delete=models.CASCADE)
     offer = models.ForeignKey(Offer, on_delete=models.CASCADE)
+    # NULL — сделка создана до появления поля, дата неизвестна; в отчёты за период не попадает
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, null=True, blank=True)
+    # Ключ идемпотентности запроса на создание (заголовок Idempotency-Key)
+    request_key = models.CharField(max_length=64, unique=True, blank=True, null=True)
 
     def calculate_commissions(self):
         """
         Рассчитывает комиссии для продавца, покупателя, риэлторов и компании.
         Возвращает словарь с рассчитанными значениями.
         """
-        property = self.offer.property
-        price = Decimal(self.offer.price)
-        seller_realtor_commission_share = Decimal(self.need.realtor.commission_share or 45)
-        buyer_realtor_commission_share = Decimal(self.offer.realtor.commission_share or 45)
-
-        if property.property_type == PropertyType.APARTMENT:
-            seller_commission = Decimal(36000) + (Decimal('0.01') * price)
-        elif property.property_type == PropertyType.LAND:
-            seller_commission = Decimal(30000) + (Decimal('0.02') * price)
-        elif property.property_type == PropertyType.HOUSE:
-            seller_commission = Decimal(30000) + (Decimal('0.01') * price)
-        else:
-            seller_commission = Decimal(0)
-
-        buyer_commission = Decimal('0.03') * price
-
-        seller_realtor_payment = (seller_commission * seller_realtor_commission_share) / Decimal(100)
-        company_payment_seller = seller_commission - seller_realtor_payment
-
-        buyer_realtor_payment = (buyer_commission * buyer_realtor_commission_share) / Decimal(100)
-        company_payment_buyer = buyer_commission - buyer_realtor_payment
-
-        return {
-            "seller_commission": seller_commission,
-            "buyer_commission": buyer_commission,
-            "seller_realtor_payment": seller_realtor_payment,
-            "company_payment_seller": company_payment_seller,
-            "buyer_realtor_payment": buyer_realtor_payment,
-            "company_payment_buyer": company_payment_buyer
-        }
+        return compute_commissions(
+            self.offer.price,
+            self.offer.property.property_type,
+            self.need.realtor.commission_share,
+            self.offer.realtor.commission_share,
+        )
 
 
     def save(self, *args, **kwargs):
         """
         Сохраняет сделку, проверяя, что потребность и предложение не участвуют в других сделках.
+        Потребность и предложение занимаются условным UPDATE ... WHERE is_active в одной транзакции
+        со вставкой сделки, поэтому из двух одновременных сделок на один объект пройдёт только одна.
         """
-        # Проверяем, связаны ли потребность или предложение с другими сделками
-        if Deal.objects.filter(need=self.need).exists():
-            raise ValidationError("This need is already part of another deal.")
-        if Deal.objects.filter(offer=self.offer).exists():
-            raise ValidationError("This offer is already part of another deal.")
+        if not self._state.adding:
+            raise ValidationError("A deal cannot be changed once created.")
+
+        with transaction.atomic():
+            # Занимаем потребность и предложение; 0 обновлённых строк — они уже в другой сделке
+            if not Need.objects.filter(pk=self.need_id, is_active=True).update(is_active=False):
+                raise ValidationError("This need is already part of another deal.")
+            if not Offer.objects.filter(pk=self.offer_id, is_active=True).update(is_active=False):
+                raise ValidationError("This offer is already part of another deal.")
 
-        # Сохраняем сделку
-        super().save(*args, **kwargs)
+            # Сохраняем сделку
+            super().save(*args, **kwargs)
+        self.need.is_active = False
+        self.offer.is_active = False
 
     def __str__(self):
         return f"Deal for {self.need} and {self.offer}"
 
     class Meta:
         constraints = [
-            models.UniqueConstraint(fields=['need', 'offer'], name='unique_deal')
+            models.UniqueConstraint(fields=['need'], name='unique_deal_need'),
+            models.UniqueConstraint(fields=['offer'], name='unique_deal_offer'),
         ]
 
 
+class Match(models.Model):
+    """
+    Материализованная пара совместимых потребности и предложения.
+    Поддерживается сигналами при изменении Offer, Need и Property.
+    """
+    need = models.ForeignKey(Need, on_delete=models.CASCADE, related_name='matches')
+    offer = models.ForeignKey(Offer, on_delete=models.CASCADE, related_name='matches')
+
+    def __str__(self):
+        return f"Совпадение {self.need_id} — {self.offer_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['need', 'offer'], name='unique_match')
+        ]
+        indexes = [
+            models.Index(fields=['offer', 'need'], name='match_offer_need_idx'),
+        ]
+
+
+# Верхняя граница длительности события: overlapping просматривает события,
+# начавшиеся не раньше чем за столько до начала интервала
+MAX_ACT_DURATION = timezone.timedelta(days=1)
+
+
+class ActQuerySet(models.QuerySet):
+    def starting_between(self, start, end):
+        """
+        События, начинающиеся в полуоткрытом интервале [start, end).
+        """
+        return self.filter(date_time__gte=start, date_time__lt=end)
+
+    def overlapping(self, start, end):
+        """
+        События, пересекающиеся с интервалом [start, end).
+        Начало события ограничивается снизу величиной start - (максимальная длительность),
+        поэтому запрос идёт диапазоном по индексу date_time, а максимум берётся по индексу duration.
+        Диапазон мал, пока длительности ограничены MAX_ACT_DURATION; одно длинное событие,
+        загруженное в обход проверок, расширяет его для всех запросов.
+        """
+        max_duration = Act.objects.aggregate(value=models.Max('duration'))['value']
+        if max_duration is None:
+            return self.none()
+        return self.filter(
+            date_time__gt=start - max_duration,
+            date_time__lt=end,
+        ).alias(
+            end_time=models.ExpressionWrapper(
+                models.F('date_time') + models.F('duration'),
+                output_field=models.DateTimeField(),
+            ),
+        ).filter(end_time__gt=start)
+
+
 class Act(models.Model):
     ACT_TYPES = [
         ('Встреча с клиентом', 'Встреча с клиентом'),
@@ -270,14 +383,83 @@ class Act(models.Model):
     ]
 
     date_time = models.DateTimeField(verbose_name="Дата и время события")
-    duration = models.DurationField(verbose_name="Длительность события")
+    duration = models.DurationField(
+        verbose_name="Длительность события",
+        validators=[MaxValueValidator(MAX_ACT_DURATION)],
+    )
     act_type = models.CharField(
         max_length=25, choices=ACT_TYPES, verbose_name="Тип события"
     )
     comment = models.TextField(verbose_name="Комментарий", blank=True, null=True)
 
+    objects = ActQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.get_act_type_display()} на {self.date_time}"
 
     class Meta:
-        ordering = ['date_time']
\ No newline at end of file
+        ordering = ['date_time']
+        indexes = [
+            models.Index(fields=['date_time'], name='act_date_time_idx'),
+            models.Index(fields=['duration'], name='act_duration_idx'),
+        ]
+
+class FulltextDocumentField(models.TextField):
+    """
+    Скрытый столбец таблицы FTS5 с именем самой таблицы — левая часть MATCH.
+    """
+
+
+@FulltextDocumentField.register_lookup
+class FulltextMatch(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class FulltextEntry(models.Model):
+    """
+    Строка таблицы FTS5 <таблица модели>_fts (api/fulltext.py). Таблицу создаёт миграция 0021
+    только в SQLite, модель нужна, чтобы соединять её с таблицей модели в запросах.
+    rank — BM25, доступен только при условии MATCH.
+    """
+    rank = models.FloatField()
+
+    class Meta:
+        abstract = True
+
+
+class ClientFulltext(FulltextEntry):
+    client = models.OneToOneField(
+        Client, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fulltext',
+    )
+    document = FulltextDocumentField(db_column='api_client_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'api_client_fts'
+
+
+class PropertyFulltext(FulltextEntry):
+    property = models.OneToOneField(
+        Property, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fulltext',
+    )
+    document = FulltextDocumentField(db_column='api_property_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'api_property_fts'
+
+
+class NeedFulltext(FulltextEntry):
+    need = models.OneToOneField(
+        Need, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='fulltext',
+    )
+    document = FulltextDocumentField(db_column='api_need_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'api_need_fts'
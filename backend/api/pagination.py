@@ -0,0 +1,71 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по id. Включается, только если в запросе передан
+    cursor или page_size, — без них список отдаётся целиком, как раньше.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_query_param not in request.query_params and
+            self.page_size_query_param not in request.query_params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class StreamingListMixin:
+    """
+    Потоковая выдача списка при ?stream=1 (JSON-массив) или ?stream=ndjson (по объекту на строку).
+    Записи читаются из БД через iterator(), поэтому расход памяти не зависит от размера таблицы.
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get('stream')
+        if stream not in ('1', 'true', 'ndjson'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if stream == 'ndjson':
+            content = self._stream_ndjson(queryset)
+            content_type = 'application/x-ndjson'
+        else:
+            content = self._stream_array(queryset)
+            content_type = 'application/json'
+        return StreamingHttpResponse(content, content_type=content_type)
+
+    def _stream_items(self, queryset):
+        chunk = []
+        for instance in queryset.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(instance)
+            if len(chunk) == self.stream_chunk_size:
+                yield from self.get_serializer(chunk, many=True).data
+                chunk = []
+        if chunk:
+            yield from self.get_serializer(chunk, many=True).data
+
+    def _dumps(self, item):
+        return json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+
+    def _stream_ndjson(self, queryset):
+        for item in self._stream_items(queryset):
+            yield self._dumps(item) + '\n'
+
+    def _stream_array(self, queryset):
+        yield '['
+        separator = ''
+        for item in self._stream_items(queryset):
+            yield separator + self._dumps(item)
+            separator = ','
+        yield ']'
@@ -0,0 +1,82 @@
+import math
+
+from shapely.geometry import Polygon
+
+
+class InvalidParameter(Exception):
+    """
+    Некорректный параметр запроса; текст уходит клиенту в поле error ответа 400.
+    """
+
+
+def parse_limit(params):
+    """
+    Необязательный limit поиска по адресу: положительное целое или None.
+    """
+    limit = params.get('limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidParameter('Limit must be an integer.')
+    if limit <= 0:
+        raise InvalidParameter('Limit must be positive.')
+    return limit
+
+
+def parse_nearby(params):
+    """
+    Параметры поиска ближайших объектов: (lat, lon, radius_km, k).
+    """
+    try:
+        latitude = float(params['lat'])
+        longitude = float(params['lon'])
+        radius_km = float(params.get('radius_km', 5))
+        k = int(params.get('k', 20))
+    except KeyError:
+        raise InvalidParameter('Parameters lat and lon are required.')
+    except ValueError:
+        raise InvalidParameter('Invalid parameters format.')
+
+    if not all(math.isfinite(value) for value in (latitude, longitude, radius_km)):
+        raise InvalidParameter('Invalid parameters format.')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise InvalidParameter('Coordinates are out of range.')
+    if radius_km <= 0 or k <= 0:
+        raise InvalidParameter('radius_km and k must be positive.')
+    return latitude, longitude, radius_km, k
+
+
+def parse_polygon(params):
+    """
+    Полигон района из параметров coordinates вида "широта,долгота".
+    """
+    coordinates = params.getlist('coordinates')
+    if not coordinates:
+        raise InvalidParameter('Coordinates are required.')
+    try:
+        points = [tuple(map(float, point.split(','))) for point in coordinates]
+        if len(points) < 3:
+            raise InvalidParameter('At least 3 points are required to form a polygon.')
+        polygon = Polygon(points)
+    except ValueError:
+        raise InvalidParameter('Invalid coordinates format.')
+    if not polygon.is_valid:
+        raise InvalidParameter('Invalid polygon.')
+    return polygon
+
+
+def parse_rank(params, default=20):
+    """
+    Параметры ранжирования подбора: (ранжировать ли, k). k имеет смысл только при rank=1.
+    """
+    if params.get('rank') not in ('1', 'true'):
+        return False, None
+    try:
+        k = int(params.get('k', default))
+    except ValueError:
+        k = 0
+    if k <= 0:
+        raise InvalidParameter('k must be a positive integer.')
+    return True, k
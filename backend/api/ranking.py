@@ -0,0 +1,147 @@
+import numpy as np
+from django.db.models import Avg
+
+from .geo import haversine_km
+from .models import Property
+
+# Вес каждой составляющей в итоговой оценке
+WEIGHTS = {
+    'price': 0.4,
+    'area': 0.2,
+    'rooms': 0.1,
+    'floor': 0.1,
+    'geo': 0.2,
+}
+
+
+def _array(values):
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def closeness(values, low, high):
+    """
+    Близость значений к середине диапазона [low, high]: 1 в середине, 0 на границе и за ней.
+    Если значение или одна из границ не заданы, результат — NaN (составляющая не учитывается).
+    """
+    values, low, high = np.broadcast_arrays(_array(values), _array(low), _array(high))
+    middle = (low + high) / 2
+    half_width = np.maximum((high - low) / 2, 1e-9)
+    with np.errstate(invalid='ignore'):
+        return np.clip(1 - np.abs(values - middle) / half_width, 0, 1)
+
+
+def geo_closeness(distances_km):
+    """
+    Близость по расстоянию: 1 для совпадающих точек, 0.5 на расстоянии 1 км и так далее.
+    """
+    return 1 / (1 + distances_km)
+
+
+def combine(components):
+    """
+    Взвешенное среднее составляющих; незаданные (NaN) составляющие не учитываются.
+    """
+    size = len(next(iter(components.values())))
+    total = np.zeros(size)
+    weights = np.zeros(size)
+    for name, values in components.items():
+        present = ~np.isnan(values)
+        total += np.where(present, values, 0) * WEIGHTS[name]
+        weights += present * WEIGHTS[name]
+    return np.divide(total, weights, out=np.zeros(size), where=weights > 0)
+
+
+def top_k(ids, scores, k):
+    """
+    Возвращает до k пар (id, score) с наибольшим score по убыванию.
+    """
+    if k < len(ids):
+        top = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[top], scores[top]
+    order = np.lexsort((ids, -scores))
+    return [(int(ids[i]), round(float(scores[i]), 4)) for i in order]
+
+
+def address_locations(addresses):
+    """
+    Примерные координаты адресов потребностей: центр известных объектов недвижимости
+    на той же улице, а если таких нет — в том же городе.
+    addresses — набор пар (город, улица); возвращает словарь пара -> (широта, долгота).
+    """
+    cities = {city for city, _ in addresses if city}
+    if not cities:
+        return {}
+
+    located = Property.objects.filter(city__in=cities, latitude__isnull=False, longitude__isnull=False)
+    by_street = {
+        (row['city'], row['street']): (row['latitude'], row['longitude'])
+        for row in located.values('city', 'street').annotate(latitude=Avg('latitude'), longitude=Avg('longitude'))
+    }
+    by_city = {
+        row['city']: (row['latitude'], row['longitude'])
+        for row in located.values('city').annotate(latitude=Avg('latitude'), longitude=Avg('longitude'))
+    }
+
+    locations = {}
+    for city, street in addresses:
+        location = by_street.get((city, street)) or by_city.get(city)
+        if location is not None:
+            locations[(city, street)] = location
+    return locations
+
+
+def rank_offers(need, offers, k):
+    """
+    Оценивает предложения для потребности и возвращает top-k пар (id предложения, score).
+    """
+    rows = list(offers.values_list(
+        'id', 'price', 'property__area', 'property__rooms', 'property__floor',
+        'property__latitude', 'property__longitude',
+    ))
+    if not rows:
+        return []
+    ids, prices, areas, rooms, floors, latitudes, longitudes = zip(*rows)
+
+    components = {
+        'price': closeness(prices, need.min_price, need.max_price),
+        'area': closeness(areas, need.min_area, need.max_area),
+        'rooms': closeness(rooms, need.min_rooms, need.max_rooms),
+        'floor': closeness(floors, need.min_floor, need.max_floor),
+    }
+    location = address_locations({(need.city, need.street)}).get((need.city, need.street))
+    if location is not None:
+        components['geo'] = geo_closeness(haversine_km(*location, _array(latitudes), _array(longitudes)))
+
+    return top_k(np.array(ids, dtype=np.int64), combine(components), k)
+
+
+def rank_needs(offer, needs, k):
+    """
+    Оценивает потребности для предложения и возвращает top-k пар (id потребности, score).
+    """
+    rows = list(needs.values_list(
+        'id', 'min_price', 'max_price', 'min_area', 'max_area', 'min_rooms', 'max_rooms',
+        'min_floor', 'max_floor', 'city', 'street',
+    ))
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    ids = np.array(columns[0], dtype=np.int64)
+    property = offer.property
+
+    components = {
+        'price': closeness(offer.price, columns[1], columns[2]),
+        'area': closeness(property.area, columns[3], columns[4]),
+        'rooms': closeness(property.rooms, columns[5], columns[6]),
+        'floor': closeness(property.floor, columns[7], columns[8]),
+    }
+    if property.latitude is not None and property.longitude is not None:
+        addresses = list(zip(columns[9], columns[10]))
+        locations = address_locations(set(addresses))
+        need_latitudes = _array([locations.get(address, (None, None))[0] for address in addresses])
+        need_longitudes = _array([locations.get(address, (None, None))[1] for address in addresses])
+        components['geo'] = geo_closeness(haversine_km(property.latitude, property.longitude, need_latitudes, need_longitudes))
+
+    return top_k(ids, combine(components), k)
@@ -0,0 +1,170 @@
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_ALIAS = 'default'
+REPLICA_ALIAS = 'replica'
+# Cookie, пока живёт которая, клиент читает из основной базы
+STICKY_COOKIE = 'db_primary'
+
+
+class _RoutingState:
+    def __init__(self, pinned):
+        # Разрешено ли читать из реплики (включает ReplicaReadMixin)
+        self.replica_reads = False
+        # Чтение закреплено за основной базой: была запись в этом запросе или недавно у клиента
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+def use_replica_for_reads():
+    """
+    Разрешает текущему запросу читать из реплики.
+    """
+    state = _state.get()
+    if state is not None:
+        state.replica_reads = True
+
+
+def reading_from_replica():
+    """
+    Читает ли текущий запрос из реплики (данные могут отставать от основной базы).
+    """
+    state = _state.get()
+    return state is not None and state.replica_reads and not state.pinned and replica_configured()
+
+
+class ReplicaRouter:
+    """
+    Запись — в основную базу, чтение — в реплику, только если запрос разрешил это
+    (ReplicaReadMixin) и клиент не закреплён за основной базой после своей записи.
+    Всё остальное (фоновые потоки, команды, проверки перед записью) читает из основной.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return REPLICA_ALIAS if reading_from_replica() else PRIMARY_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+            state.wrote = True
+        return PRIMARY_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # В обеих базах одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему вместе с данными от команды replicate_db
+        return db == PRIMARY_ALIAS
+
+
+def _iterate_with_state(state, content):
+    iterator = iter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+async def _aiterate_with_state(state, content):
+    iterator = aiter(content)
+    while True:
+        token = _state.set(state)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            _state.reset(token)
+        yield chunk
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Хранит состояние маршрутизации на время запроса. После записи (или любого
+    небезопасного метода) выставляет cookie на REPLICA_STICKY_SECONDS: всё это время
+    запросы клиента читают из основной базы и видят свои изменения, даже пока реплика отстаёт.
+    Потоковый ответ (StreamingListMixin) читает БД уже после выхода из представления,
+    поэтому состояние восстанавливается на время получения каждого его фрагмента.
+    """
+
+    # Работает и под ASGI без переключения в поток для асинхронных представлений
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = _RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._process_response(request, state, response)
+
+    async def __acall__(self, request):
+        state = _RoutingState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self._process_response(request, state, response)
+
+    def _process_response(self, request, state, response):
+        # Файлы не читают БД, а замена содержимого отключила бы wsgi.file_wrapper
+        if response.streaming and not isinstance(response, FileResponse):
+            if response.is_async:
+                response.streaming_content = _aiterate_with_state(state, response.streaming_content)
+            else:
+                response.streaming_content = _iterate_with_state(state, response.streaming_content)
+        if replica_configured() and (state.wrote or request.method not in SAFE_METHODS):
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Разрешает читать из реплики безопасным запросам к действиям из replica_actions.
+    """
+    replica_actions = (
+        'list', 'retrieve', 'search', 'search_by_address', 'search_in_region', 'nearby',
+        'matching_needs', 'matching_offers', 'counts', 'conflicts',
+    )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and self.action in self.replica_actions:
+            use_replica_for_reads()
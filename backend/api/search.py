@@ -0,0 +1,372 @@
+import threading
+
+import Levenshtein
+import numpy as np
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rapidfuzz import process
+from rapidfuzz.distance import Levenshtein as RapidLevenshtein
+
+from .models import Client, Property, Realtor
+
+
+class BKTree:
+    """
+    BK-дерево для поиска слов в пределах заданного расстояния Левенштейна.
+    Каждый узел хранит слово и множество ключей (id объектов), которым оно принадлежит.
+    """
+
+    def __init__(self, distance=Levenshtein.distance):
+        self._distance = distance
+        self._root = None
+        self._nodes = {}
+
+    def add(self, word, key):
+        node = self._nodes.get(word)
+        if node is not None:
+            node[1].add(key)
+            return
+
+        node = [word, {key}, {}]
+        self._nodes[word] = node
+        if self._root is None:
+            self._root = node
+            return
+
+        current = self._root
+        while True:
+            d = self._distance(word, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+
+    def discard(self, word, key):
+        # Узел остаётся в дереве (он нужен для навигации), удаляется только ключ
+        node = self._nodes.get(word)
+        if node is not None:
+            node[1].discard(key)
+
+    def search(self, word, max_distance):
+        """
+        Возвращает множество ключей всех слов, расстояние до которых не больше max_distance.
+        """
+        result = set()
+        if self._root is None:
+            return result
+
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = self._distance(word, node[0])
+            if d <= max_distance:
+                result.update(node[1])
+            low, high = d - max_distance, d + max_distance
+            for edge, child in node[2].items():
+                if low <= edge <= high:
+                    stack.append(child)
+        return result
+
+
+class NameIndex:
+    """
+    Индекс частей ФИО для нечёткого поиска.
+    Строится лениво при первом запросе и поддерживается сигналами модели.
+    """
+
+    def __init__(self, model, fields, max_distance=3):
+        self.model = model
+        self.fields = fields
+        self.max_distance = max_distance
+        self._lock = threading.RLock()
+        self._tree = None
+        self._parts = {}
+
+    @staticmethod
+    def _split(values):
+        return {value.lower() for value in values if value}
+
+    def _ensure_loaded(self):
+        if self._tree is not None:
+            return
+        with self._lock:
+            if self._tree is not None:
+                return
+            # Индекс догоняют сигналы записей в основную базу, поэтому и строится он по ней, а не по реплике
+            tree = BKTree()
+            parts = {}
+            rows = self.model.objects.using(DEFAULT_DB_ALIAS).values_list('pk', *self.fields).iterator(chunk_size=5000)
+            for pk, *values in rows:
+                name_parts = self._split(values)
+                parts[pk] = name_parts
+                for part in name_parts:
+                    tree.add(part, pk)
+            self._parts = parts
+            self._tree = tree
+
+    def _add(self, pk, values):
+        with self._lock:
+            if self._tree is None:
+                return
+            self._remove(pk)
+            name_parts = self._split(values)
+            self._parts[pk] = name_parts
+            for part in name_parts:
+                self._tree.add(part, pk)
+
+    def _remove(self, pk):
+        with self._lock:
+            if self._tree is None:
+                return
+            for part in self._parts.pop(pk, ()):
+                self._tree.discard(part, pk)
+
+    def update(self, instance):
+        """
+        Обновляет запись объекта после фиксации транзакции.
+        """
+        pk = instance.pk
+        values = [getattr(instance, field) for field in self.fields]
+        transaction.on_commit(lambda: self._add(pk, values))
+
+    def remove(self, instance):
+        """
+        Удаляет запись объекта после фиксации транзакции.
+        """
+        pk = instance.pk
+        transaction.on_commit(lambda: self._remove(pk))
+
+    def reset(self):
+        """
+        Сбрасывает индекс; он будет перестроен при следующем поиске.
+        """
+        with self._lock:
+            self._tree = None
+            self._parts = {}
+
+    def search(self, query):
+        """
+        Возвращает отсортированный список id объектов, у которых хотя бы одна часть ФИО
+        отличается от какой-либо части запроса не более чем на max_distance.
+        """
+        self._ensure_loaded()
+        query_parts = query.lower().split()
+        with self._lock:
+            matches = set()
+            for query_part in query_parts:
+                matches |= self._tree.search(query_part, self.max_distance)
+        return sorted(matches)
+
+    def search_objects(self, query):
+        """
+        Возвращает объекты модели, найденные по запросу, в порядке id.
+        """
+        pks = self.search(query)
+        objects = self.model.objects.in_bulk(pks)
+        return [objects[pk] for pk in pks if pk in objects]
+
+
+class _EncodedColumn:
+    """
+    Столбец строк, закодированный словарём: уникальные значения хранятся один раз,
+    а для каждой строки таблицы хранится только код значения.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.lookup = {}
+
+    def encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.lookup[value] = code
+            self.values.append(value)
+        return code
+
+    def snapshot(self):
+        """
+        Уникальные значения и код пустой строки на текущий момент; значения только дописываются.
+        """
+        return self.values[:], self.lookup.get('')
+
+
+def _min_distances(query_parts, values, cutoff):
+    """
+    Минимальное расстояние Левенштейна от частей запроса до каждого значения.
+    cdist отпускает GIL; число его потоков на запрос задаёт FUZZY_SEARCH_WORKERS.
+    """
+    matrix = process.cdist(
+        query_parts, values,
+        scorer=RapidLevenshtein.distance,
+        score_cutoff=cutoff,
+        dtype=np.int32,
+        workers=getattr(settings, 'FUZZY_SEARCH_WORKERS', 1),
+    )
+    return matrix.min(axis=0)
+
+
+class AddressIndex:
+    """
+    Колоночный индекс адресов объектов недвижимости для пакетного нечёткого поиска.
+    Расстояния считаются RapidFuzz только по уникальным значениям каждого столбца.
+    """
+
+    # Столбец -> максимальное расстояние, при котором столбец считается совпавшим
+    COLUMNS = {
+        'city': 3,
+        'street': 3,
+        'house_number': 1,
+        'apartment_number': 1,
+        'property_type': 3,
+    }
+    # Пустые номера дома и квартиры не участвуют в сравнении
+    NON_EMPTY_COLUMNS = ('house_number', 'apartment_number')
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset_storage()
+
+    def _reset_storage(self, capacity=1024):
+        self._size = 0
+        self._positions = {}
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._columns = {name: _EncodedColumn() for name in self.COLUMNS}
+        self._codes = {name: np.zeros(capacity, dtype=np.int32) for name in self.COLUMNS}
+
+    def _grow(self):
+        capacity = len(self._ids) * 2
+        self._ids = np.resize(self._ids, capacity)
+        self._alive = np.resize(self._alive, capacity)
+        self._alive[self._size:] = False
+        for name in self._codes:
+            self._codes[name] = np.resize(self._codes[name], capacity)
+
+    def _put(self, pk, row):
+        position = self._positions.get(pk)
+        if position is None:
+            if self._size == len(self._ids):
+                self._grow()
+            position = self._size
+            self._size += 1
+            self._positions[pk] = position
+            self._ids[position] = pk
+        self._alive[position] = True
+        for name, value in zip(self.COLUMNS, row):
+            self._codes[name][position] = self._columns[name].encode((value or '').lower())
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            # Индекс догоняют сигналы записей в основную базу, поэтому и строится он по ней, а не по реплике
+            self._reset_storage(max(1024, self.model.objects.using(DEFAULT_DB_ALIAS).count()))
+            rows = self.model.objects.using(DEFAULT_DB_ALIAS).values_list('pk', *self.COLUMNS).iterator(chunk_size=5000)
+            for pk, *row in rows:
+                self._put(pk, row)
+            self._loaded = True
+
+    def _add(self, pk, row):
+        with self._lock:
+            if self._loaded:
+                self._put(pk, row)
+
+    def _remove(self, pk):
+        with self._lock:
+            position = self._positions.get(pk)
+            if self._loaded and position is not None:
+                self._alive[position] = False
+
+    def update(self, instance):
+        """
+        Обновляет запись объекта после фиксации транзакции.
+        """
+        pk = instance.pk
+        row = [getattr(instance, name) for name in self.COLUMNS]
+        transaction.on_commit(lambda: self._add(pk, row))
+
+    def remove(self, instance):
+        """
+        Удаляет запись объекта после фиксации транзакции.
+        """
+        pk = instance.pk
+        transaction.on_commit(lambda: self._remove(pk))
+
+    def reset(self):
+        """
+        Сбрасывает индекс; он будет перестроен при следующем поиске.
+        """
+        with self._lock:
+            self._loaded = False
+            self._reset_storage()
+
+    def search(self, query, limit=None):
+        """
+        Возвращает список пар (id, score), отсортированный по убыванию score.
+        Объект подходит, если совпал хотя бы один столбец; score — сумма запаса
+        по порогу расстояния для всех совпавших столбцов.
+        """
+        self._ensure_loaded()
+        query_parts = query.lower().split()
+        if not query_parts:
+            return []
+
+        # Под блокировкой только копируются данные: расчёт расстояний не задерживает
+        # другие поиски и обновления индекса из сигналов
+        with self._lock:
+            size = self._size
+            alive = self._alive[:size].copy()
+            ids = self._ids[:size].copy()
+            columns = {
+                name: (*self._columns[name].snapshot(), self._codes[name][:size].copy())
+                for name in self.COLUMNS
+            }
+
+        matched = np.zeros(size, dtype=bool)
+        scores = np.zeros(size, dtype=np.int32)
+        for name, threshold in self.COLUMNS.items():
+            values, empty_code, codes = columns[name]
+            value_distances = _min_distances(query_parts, values, max(self.COLUMNS.values()))
+            if name in self.NON_EMPTY_COLUMNS and empty_code is not None:
+                value_distances[empty_code] = threshold + 1
+            distances = value_distances[codes]
+            column_matched = distances <= threshold
+            matched |= column_matched
+            scores += np.where(column_matched, threshold + 1 - distances, 0)
+
+        candidates = np.flatnonzero(matched & alive)
+        candidate_ids = ids[candidates]
+        candidate_scores = scores[candidates]
+
+        if limit is not None and limit < len(candidates):
+            top = np.argpartition(-candidate_scores, limit - 1)[:limit]
+            candidate_ids = candidate_ids[top]
+            candidate_scores = candidate_scores[top]
+
+        order = np.lexsort((candidate_ids, -candidate_scores))
+        return [(int(candidate_ids[i]), int(candidate_scores[i])) for i in order]
+
+    def search_objects(self, query, limit=None):
+        """
+        Возвращает пары (объект, score) в порядке ранжирования.
+        """
+        ranked = self.search(query, limit)
+        objects = self.model.objects.in_bulk([pk for pk, _ in ranked])
+        return [(objects[pk], score) for pk, score in ranked if pk in objects]
+
+
+# Индексы живут в памяти процесса и обновляются только сигналами моделей (массовые эндпоинты —
+# через sync_bulk_write, загрузка из api/transfer.py — через reset()). Отсюда два условия:
+# - приложение обслуживает один процесс (потоков может быть сколько угодно): записи,
+#   сделанные в другом процессе, этот процесс не увидит до перезапуска;
+# - код, пишущий в обход сигналов (queryset.update() индексируемых полей, bulk_create,
+#   сырой SQL), сам вызывает update()/remove() или reset() соответствующего индекса.
+client_name_index = NameIndex(Client, ('first_name', 'last_name', 'patronymic'))
+realtor_name_index = NameIndex(Realtor, ('first_name', 'last_name', 'patronymic'))
+property_address_index = AddressIndex(Property)
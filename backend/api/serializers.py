@@ -1,6 +1,90 @@
 from rest_framework import serializers
+from .images import variant_urls
 from .models import Act, Client, Deal, Need, Offer, Property, Realtor
 
+
+class NestedShape:
+    """
+    Описание вложенного объекта в ответе: список полей и вложенные связи.
+    Из этой же схемы строится список связей для select_related.
+    """
+
+    def __init__(self, fields, **related):
+        self.fields = fields
+        self.related = related
+
+    def represent(self, instance):
+        data = {field: getattr(instance, field) for field in self.fields}
+        for name, shape in self.related.items():
+            data[name] = shape.represent(getattr(instance, name))
+        return data
+
+    def related_paths(self, prefix=''):
+        paths = []
+        for name, shape in self.related.items():
+            path = f"{prefix}{name}"
+            paths.append(path)
+            paths.extend(shape.related_paths(f"{path}__"))
+        return paths
+
+
+CLIENT_SHAPE = NestedShape(['id', 'last_name', 'first_name', 'patronymic', 'phone', 'email', 'full_name'])
+REALTOR_SHAPE = NestedShape(['id', 'last_name', 'first_name', 'patronymic', 'commission_share', 'full_name'])
+PROPERTY_SHAPE = NestedShape([
+    'id', 'property_type', 'city', 'street', 'house_number', 'apartment_number',
+    'latitude', 'longitude', 'area', 'floor', 'rooms', 'floors', 'address',
+])
+NEED_FIELDS = [
+    'id', 'property_type', 'address', 'min_price', 'max_price', 'min_area', 'max_area',
+    'min_rooms', 'max_rooms', 'min_floor', 'max_floor', 'min_floors', 'max_floors',
+]
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Первичный ключ связи, который при пакетной обработке ищется в заранее загруженных
+    объектах context['prefetched'][модель] вместо отдельного запроса на каждую строку.
+    """
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self.get_queryset().model)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = prefetched.get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class NestedRepresentationMixin:
+    """
+    Заменяет первичные ключи связей из Meta.nested вложенными объектами.
+    """
+
+    def to_representation(self, instance):
+        """
+        Переопределяем метод для представления данных.
+        """
+        representation = super().to_representation(instance)
+        # Добавляем вложенные объекты
+        for name, shape in self.Meta.nested.items():
+            representation[name] = shape.represent(getattr(instance, name))
+        return representation
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Подгружает все вложенные связи одним запросом через select_related.
+        """
+        return queryset.select_related(*NestedShape([], **cls.Meta.nested).related_paths())
+
+
 class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
@@ -39,78 +123,62 @@ class RealtorSerializer(serializers.ModelSerializer):
 
 
 class PropertySerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Property
         fields = [
             'id', 'property_type', 'city', 'street', 'house_number', 'apartment_number',
-            'latitude', 'longitude', 'area', 'floor', 'rooms', 'floors', 'address','image'
+            'latitude', 'longitude', 'area', 'floor', 'rooms', 'floors', 'address','image',
+            'image_variants',
         ]
-      
 
-class OfferSerializer(serializers.ModelSerializer):
-    client = serializers.PrimaryKeyRelatedField(queryset=Client.objects.all())
-    realtor = serializers.PrimaryKeyRelatedField(queryset=Realtor.objects.all())
-    property = serializers.PrimaryKeyRelatedField(queryset=Property.objects.all())
+    def get_image_variants(self, property):
+        """
+        URL уменьшенных WebP-копий изображения (thumb, medium), абсолютные — как у поля image.
+        """
+        urls = variant_urls(property)
+        request = self.context.get('request')
+        if request is not None:
+            urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+        return urls
+
+
+class OfferSerializer(NestedRepresentationMixin, serializers.ModelSerializer):
+    client = PrefetchedPrimaryKeyRelatedField(queryset=Client.objects.all())
+    realtor = PrefetchedPrimaryKeyRelatedField(queryset=Realtor.objects.all())
+    property = PrefetchedPrimaryKeyRelatedField(queryset=Property.objects.all())
     class Meta:
         model = Offer
-        fields = ['id','price','client','realtor','property']
+        fields = ['id','price','client','realtor','property','is_active']
+        read_only_fields = ['is_active']
+        nested = {
+            'client': CLIENT_SHAPE,
+            'realtor': REALTOR_SHAPE,
+            'property': PROPERTY_SHAPE,
+        }
 
     def validate(self, data):
         """
         Проверяем, что предложение корректное.
         """
-        if data['price'] <= 0:
+        if 'price' in data and data['price'] <= 0:
             raise serializers.ValidationError("Цена должна быть положительным числом.")
         return data
-    
-    def to_representation(self, instance):
-        """
-        Переопределяем метод для представления данных.
-        """
-        representation = super().to_representation(instance)
-        # Добавляем вложенные объекты
-        representation['client'] = {
-            "id": instance.client.id,
-            "last_name": instance.client.last_name,
-            "first_name": instance.client.first_name,
-            "patronymic": instance.client.patronymic,
-            "phone": instance.client.phone,
-            "email": instance.client.email,
-            "full_name": instance.client.full_name,
-        }
-        representation['realtor'] = {
-            "id": instance.realtor.id,
-            "last_name": instance.realtor.last_name,
-            "first_name": instance.realtor.first_name,
-            "patronymic": instance.realtor.patronymic,
-            "commission_share": instance.realtor.commission_share,
-            "full_name": instance.realtor.full_name,
-        }
-        representation['property'] = {
-            "id": instance.property.id,
-            "property_type": instance.property.property_type,
-            "city": instance.property.city,
-            "street": instance.property.street,
-            "house_number": instance.property.house_number,
-            "apartment_number": instance.property.apartment_number,
-            "latitude": instance.property.latitude,
-            "longitude": instance.property.longitude,
-            "area": instance.property.area,
-            "floor": instance.property.floor,
-            "rooms": instance.property.rooms,
-            "floors": instance.property.floors,
-            "address": instance.property.address,
-        }
-        return representation
 
 
-class NeedSerializer(serializers.ModelSerializer):
-    client = serializers.PrimaryKeyRelatedField(queryset=Client.objects.all())
-    realtor = serializers.PrimaryKeyRelatedField(queryset=Realtor.objects.all())
+class NeedSerializer(NestedRepresentationMixin, serializers.ModelSerializer):
+    client = PrefetchedPrimaryKeyRelatedField(queryset=Client.objects.all())
+    realtor = PrefetchedPrimaryKeyRelatedField(queryset=Realtor.objects.all())
     class Meta:
         model = Need
         fields = ['id','property_type','address','city', 'street', 'house_number', 'apartment_number','min_price','max_price','min_area','max_area','min_rooms','max_rooms',
-                  'min_floor','max_floor','min_floors','max_floors','client','realtor']
+                  'min_floor','max_floor','min_floors','max_floors','client','realtor','is_active']
+        read_only_fields = ['is_active']
+        nested = {
+            'client': CLIENT_SHAPE,
+            'realtor': REALTOR_SHAPE,
+        }
 
     def validate(self, data):
         """
@@ -120,38 +188,28 @@ class NeedSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Минимальная цена не может быть выше максимальной.")
         
         return data
-    
-    def to_representation(self, instance):
-        """
-        Переопределяем метод для представления данных.
-        """
-        representation = super().to_representation(instance)
-        # Добавляем вложенные объекты
-        representation['client'] = {
-            "id": instance.client.id,
-            "last_name": instance.client.last_name,
-            "first_name": instance.client.first_name,
-            "patronymic": instance.client.patronymic,
-            "phone": instance.client.phone,
-            "email": instance.client.email,
-            "full_name": instance.client.full_name,
-        }
-        representation['realtor'] = {
-            "id": instance.realtor.id,
-            "last_name": instance.realtor.last_name,
-            "first_name": instance.realtor.first_name,
-            "patronymic": instance.realtor.patronymic,
-            "commission_share": instance.realtor.commission_share,
-            "full_name": instance.realtor.full_name,
-        }
-        return representation
 
-class DealSerializer(serializers.ModelSerializer):
+class DealSerializer(NestedRepresentationMixin, serializers.ModelSerializer):
     need= serializers.PrimaryKeyRelatedField(queryset=Need.objects.all())
     offer = serializers.PrimaryKeyRelatedField(queryset=Offer.objects.all())
     class Meta:
         model = Deal
         fields = ['id', 'need' , 'offer']
+        # Уникальность участников обеспечивают ограничения БД и Deal.save, без лишних запросов
+        validators = []
+        nested = {
+            'need': NestedShape(
+                NEED_FIELDS,
+                client=CLIENT_SHAPE,
+                realtor=REALTOR_SHAPE,
+            ),
+            'offer': NestedShape(
+                ['id', 'price'],
+                client=CLIENT_SHAPE,
+                realtor=REALTOR_SHAPE,
+                property=PROPERTY_SHAPE,
+            ),
+        }
 
     def validate(self, data):
         """
@@ -162,82 +220,6 @@ class DealSerializer(serializers.ModelSerializer):
         if data['offer'].is_in_deal():
             raise serializers.ValidationError("Выбранное предложение уже является частью сделки.")
         return data
-    
-    def to_representation(self, instance):
-        """
-        Переопределяем метод для представления данных.
-        """
-        representation = super().to_representation(instance)
-        representation['need'] = {
-            "id": instance.need.id,
-            "property_type": instance.need.property_type,
-            "address": instance.need.address,
-            "min_price": instance.need.min_price,
-            "max_price": instance.need.max_price,
-            "min_area": instance.need.min_area,
-            "max_area": instance.need.max_area,
-            "min_rooms": instance.need.min_rooms,
-            "max_rooms": instance.need.max_rooms,
-            "min_floor": instance.need.min_floor,
-            "max_floor": instance.need.max_floor,
-            "min_floors": instance.need.min_floors,
-            "max_floors": instance.need.max_floors,
-            "client": {
-                "id": instance.need.client.id,
-                "last_name": instance.need.client.last_name,
-                "first_name": instance.need.client.first_name,
-                "patronymic": instance.need.client.patronymic,
-                "phone": instance.need.client.phone,
-                "email": instance.need.client.email,
-                "full_name": instance.need.client.full_name,
-            },
-            "realtor": {
-                "id": instance.need.realtor.id,
-                "last_name": instance.need.realtor.last_name,
-                "first_name": instance.need.realtor.first_name,
-                "patronymic": instance.need.realtor.patronymic,
-                "commission_share": instance.need.realtor.commission_share,
-                "full_name": instance.need.realtor.full_name,
-            },
-        }
-        representation['offer'] = {
-            "id": instance.offer.id,
-            "price": instance.offer.price,
-            "client": {
-                "id": instance.offer.client.id,
-                "last_name": instance.offer.client.last_name,
-                "first_name": instance.offer.client.first_name,
-                "patronymic": instance.offer.client.patronymic,
-                "phone": instance.offer.client.phone,
-                "email": instance.offer.client.email,
-                "full_name": instance.offer.client.full_name,
-            },
-            "realtor": {
-                "id": instance.offer.realtor.id,
-                "last_name": instance.offer.realtor.last_name,
-                "first_name": instance.offer.realtor.first_name,
-                "patronymic": instance.offer.realtor.patronymic,
-                "commission_share": instance.offer.realtor.commission_share,
-                "full_name": instance.offer.realtor.full_name,
-            },
-            "property": {
-                "id": instance.offer.property.id,
-                "property_type": instance.offer.property.property_type,
-                "city": instance.offer.property.city,
-                "street": instance.offer.property.street,
-                "house_number": instance.offer.property.house_number,
-                "apartment_number": instance.offer.property.apartment_number,
-                "latitude": instance.offer.property.latitude,
-                "longitude": instance.offer.property.longitude,
-                "area": instance.offer.property.area,
-                "floor": instance.offer.property.floor,
-                "rooms": instance.offer.property.rooms,
-                "floors": instance.offer.property.floors,
-                "address": instance.offer.property.address,
-            },
-        }
-        return representation
-    
 
 
 class ActSerializer(serializers.ModelSerializer):
@@ -0,0 +1,102 @@
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .caching import bump_generation
+from .commissions import invalidate_commissions, invalidate_realtor_commissions
+from .fulltext import register_functions, restore_triggers
+from .geo import property_grid_index
+from .images import schedule_variants
+from .matching import refresh_need_matches, refresh_offer_matches, refresh_property_matches
+from .models import Client, Deal, Need, Offer, Property, Realtor
+from .search import client_name_index, property_address_index, realtor_name_index
+
+
+@receiver(post_save, sender=Client)
+def update_client_name_index(sender, instance, **kwargs):
+    client_name_index.update(instance)
+
+
+@receiver(post_delete, sender=Client)
+def remove_client_from_name_index(sender, instance, **kwargs):
+    client_name_index.remove(instance)
+
+
+@receiver(post_save, sender=Realtor)
+def update_realtor_name_index(sender, instance, created, **kwargs):
+    realtor_name_index.update(instance)
+    if not created:
+        invalidate_realtor_commissions(instance)
+
+
+@receiver(post_delete, sender=Realtor)
+def remove_realtor_from_name_index(sender, instance, **kwargs):
+    realtor_name_index.remove(instance)
+
+
+@receiver(post_save, sender=Property)
+def update_property_indexes(sender, instance, created, **kwargs):
+    property_address_index.update(instance)
+    property_grid_index.update(instance)
+    if not created:
+        refresh_property_matches(instance)
+        invalidate_commissions(Deal.objects.filter(offer__property=instance))
+
+
+@receiver(post_save, sender=Property)
+def schedule_property_image_variants(sender, instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Property)
+def remove_property_from_indexes(sender, instance, **kwargs):
+    property_address_index.remove(instance)
+    property_grid_index.remove(instance)
+
+
+# Совпадения удаляются каскадно вместе с потребностью или предложением,
+# поэтому достаточно пересчитывать их при сохранении
+@receiver(post_save, sender=Offer)
+def update_offer_matches(sender, instance, created, **kwargs):
+    refresh_offer_matches(instance)
+    if not created:
+        invalidate_commissions(Deal.objects.filter(offer=instance))
+
+
+@receiver(post_save, sender=Need)
+def update_need_matches(sender, instance, created, **kwargs):
+    refresh_need_matches(instance)
+    if not created:
+        invalidate_commissions(Deal.objects.filter(need=instance))
+
+
+@receiver(post_delete, sender=Deal)
+def release_deal_participants(sender, instance, **kwargs):
+    # Срабатывает и при каскадном удалении сделки, в той же транзакции
+    Need.objects.filter(pk=instance.need_id).update(is_active=True)
+    Offer.objects.filter(pk=instance.offer_id).update(is_active=True)
+    invalidate_commissions([instance.pk])
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_response_cache_generation(sender, **kwargs):
+    if sender._meta.app_label != 'api':
+        return
+    models = [sender]
+    # Создание и удаление сделки меняет is_active потребности и предложения через update()
+    if sender is Deal:
+        models += [Need, Offer]
+    bump_generation(*models)
+
+
+@receiver(connection_created)
+def register_fulltext_functions(sender, connection, **kwargs):
+    register_functions(connection)
+
+
+@receiver(post_migrate)
+def restore_fulltext_triggers(sender, using, **kwargs):
+    if sender.name == 'api':
+        restore_triggers(connections[using])
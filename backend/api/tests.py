@@ -0,0 +1,771 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import commissions, media, routers, transfer
+from . import search as search_module
+from .caching import RESPONSE_CACHE_ALIAS, current_generations
+from .geo import property_grid_index
+from .models import Act, Client, Deal, Match, Need, Offer, Property, PropertyType, Realtor
+from .search import AddressIndex, client_name_index, property_address_index
+from .views import DealViewSet
+
+
+def create_rows(count):
+    """
+    Создаёт по count объектов недвижимости, клиентов, риэлторов, предложений, потребностей,
+    сделок и событий. Первое предложение совпадает со всеми потребностями, первая
+    потребность — со всеми предложениями. Возвращает первые предложение и потребность.
+    """
+    realtor = Realtor.objects.create(last_name='Тестов', first_name='Тест', patronymic='Тестович')
+    properties = Property.objects.bulk_create([
+        Property(property_type=PropertyType.APARTMENT, city='Город', street='Улица', area=50)
+        for _ in range(count)
+    ])
+    clients = Client.objects.bulk_create([Client(first_name=f'Клиент {i}', phone=str(i)) for i in range(count)])
+    realtors = Realtor.objects.bulk_create([
+        Realtor(last_name='Риелтор', first_name=str(i), patronymic='Р') for i in range(count)
+    ])
+    offers = Offer.objects.bulk_create([
+        Offer(client=clients[i], realtor=realtors[i], property=properties[i], price=1000)
+        for i in range(count)
+    ])
+    needs = Need.objects.bulk_create([
+        Need(client=clients[i], realtor=realtor, property_type=PropertyType.APARTMENT, min_price=1, max_price=2000)
+        for i in range(count)
+    ])
+    # bulk_create обходит проверки Deal.save, здесь это и нужно
+    Deal.objects.bulk_create([Deal(need=needs[i], offer=offers[i]) for i in range(count)])
+    Match.objects.bulk_create(
+        [Match(need=need, offer=offers[0]) for need in needs] +
+        [Match(need=needs[0], offer=offer) for offer in offers[1:]]
+    )
+    Act.objects.bulk_create([
+        Act(date_time=timezone.now(), duration=timezone.timedelta(minutes=30), act_type=Act.ACT_TYPES[0][0])
+        for _ in range(count)
+    ])
+    return offers[0], needs[0]
+
+
+class QueryCountTests(TestCase):
+    """
+    Число SQL-запросов эндпоинтов не должно зависеть от числа строк.
+    """
+
+    LIST_ENDPOINTS = [
+        '/api/clients/',
+        '/api/realtors/',
+        '/api/properties/',
+        '/api/offers/',
+        '/api/needs/',
+        '/api/deals/',
+        '/api/acts/',
+        '/api/matches/',
+        '/api/matches/?page_size=5',
+    ]
+    DETAIL_ENDPOINTS = {
+        Client: '/api/clients/{}/',
+        Realtor: '/api/realtors/{}/',
+        Property: '/api/properties/{}/',
+        Offer: '/api/offers/{}/',
+        Need: '/api/needs/{}/',
+        Deal: '/api/deals/{}/',
+        Act: '/api/acts/{}/',
+    }
+
+    def _urls(self, offer, need):
+        urls = list(self.LIST_ENDPOINTS)
+        urls += [url.format(model.objects.order_by('pk').first().pk) for model, url in self.DETAIL_ENDPOINTS.items()]
+        urls += [
+            f'/api/offers/{offer.pk}/matching-needs/',
+            f'/api/needs/{need.pk}/matching-offers/',
+            f'/api/offers/{offer.pk}/matching-needs/?rank=1',
+            f'/api/needs/{need.pk}/matching-offers/?rank=1',
+        ]
+        return urls
+
+    def _get(self, url):
+        # Кэш ответов внутри транзакции TestCase не используется, запросы выполняются всегда
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        if response.streaming:
+            # Потоковый ответ выполняет запросы при чтении
+            b''.join(response.streaming_content)
+        return response
+
+    def _query_counts(self, urls):
+        counts = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as context:
+                self._get(url)
+            counts.append(len(context.captured_queries))
+        return counts
+
+    def test_query_count_does_not_grow_with_rows(self):
+        expected = self._query_counts(self._urls(*create_rows(2)))
+        # Во второй раз списки и подборы возвращают в 11 раз больше строк
+        for url, count in zip(self._urls(*create_rows(20)), expected):
+            with self.subTest(url=url), self.assertNumQueries(count):
+                self._get(url)
+
+
+class IdempotentDealTests(TestCase):
+    """
+    Повтор запроса с тем же Idempotency-Key возвращает уже созданную сделку.
+    """
+
+    def setUp(self):
+        offer, need = create_rows(1)
+        Deal.objects.all().delete()
+        Need.objects.update(is_active=True)
+        Offer.objects.update(is_active=True)
+        self.payload = {'need': need.pk, 'offer': offer.pk}
+
+    def _post(self, key):
+        return self.client.post('/api/deals/', self.payload, content_type='application/json',
+                                headers={'Idempotency-Key': key})
+
+    def test_retry_returns_existing_deal(self):
+        created = self._post('key')
+        self.assertEqual(created.status_code, 201)
+        retried = self._post('key')
+        self.assertEqual(retried.status_code, 200)
+        self.assertEqual(retried.json()['id'], created.json()['id'])
+
+    def test_retry_racing_with_first_request_returns_existing_deal(self):
+        deal = Deal.objects.create(need_id=self.payload['need'], offer_id=self.payload['offer'], request_key='key')
+        original = DealViewSet._existing_deal
+        calls = []
+
+        def existing_deal(view, request_key):
+            # Первая проверка выполняется до того, как первый запрос зафиксировал сделку
+            calls.append(request_key)
+            return None if len(calls) == 1 else original(view, request_key)
+
+        with mock.patch.object(DealViewSet, '_existing_deal', existing_deal):
+            response = self._post('key')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], deal.pk)
+
+    def test_retry_with_other_participants_is_rejected(self):
+        self.assertEqual(self._post('key').status_code, 201)
+        other_offer = Offer.objects.create(
+            client=Client.objects.first(), realtor=Realtor.objects.first(), property=Property.objects.first(), price=1,
+        )
+        self.payload['offer'] = other_offer.pk
+        self.assertEqual(self._post('key').status_code, 422)
+        self.assertEqual(Deal.objects.count(), 1)
+
+    def test_too_long_key_is_rejected(self):
+        response = self._post('k' * 65)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Deal.objects.exists())
+
+
+class CommissionCacheTests(TestCase):
+    """
+    Кэш комиссий не сохраняет результат, рассчитанный до сброса.
+    """
+
+    def setUp(self):
+        create_rows(1)
+        self.deal = Deal.objects.get()
+        caches[commissions.CACHE_ALIAS].clear()
+
+    def test_result_is_cached(self):
+        first = commissions.cached_commissions(self.deal.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(commissions.cached_commissions(self.deal.pk), first)
+
+    def test_invalidation_during_computation_skips_caching(self):
+        compute = commissions.compute_commissions
+
+        def compute_and_invalidate(*args):
+            with self.captureOnCommitCallbacks(execute=True):
+                commissions.invalidate_commissions([self.deal.pk])
+            return compute(*args)
+
+        with mock.patch.object(commissions, 'compute_commissions', compute_and_invalidate):
+            commissions.cached_commissions(self.deal.pk)
+        with self.assertNumQueries(1):
+            commissions.cached_commissions(self.deal.pk)
+
+
+class ResponseCacheTests(TransactionTestCase):
+    """
+    Кэш ответов: повтор без запросов, 304 по ETag и сброс после записи.
+    """
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        Client.objects.create(first_name='Первый', phone='1')
+
+    def test_cached_until_write(self):
+        first = self.client.get('/api/clients/')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/clients/')
+        self.assertEqual(cached.json(), first.json())
+
+        not_modified = self.client.get('/api/clients/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+        Client.objects.create(first_name='Второй', phone='2')
+        changed = self.client.get('/api/clients/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()), 2)
+        self.assertNotIn('Last-Modified', changed)
+
+    def test_not_cached_inside_transaction(self):
+        self.client.get('/api/clients/')
+        with transaction.atomic():
+            Client.objects.create(first_name='Второй', phone='2')
+            # Поколение сменится только после фиксации, а ответ должен видеть запись
+            self.assertEqual(len(self.client.get('/api/clients/').json()), 2)
+            transaction.set_rollback(True)
+
+
+class ActConflictTests(TestCase):
+    """
+    Поиск пересекающихся событий.
+    """
+
+    def setUp(self):
+        self.act = Act.objects.create(
+            date_time=timezone.now(), duration=timezone.timedelta(hours=1), act_type=Act.ACT_TYPES[0][0],
+        )
+        self.params = {'date_time': self.act.date_time.isoformat(), 'duration': '00:30:00'}
+
+    def test_conflicts(self):
+        response = self.client.get('/api/acts/conflicts/', self.params)
+        self.assertEqual([act['id'] for act in response.json()], [self.act.pk])
+        response = self.client.get('/api/acts/conflicts/', {**self.params, 'exclude': self.act.pk})
+        self.assertEqual(response.json(), [])
+
+    def test_invalid_exclude(self):
+        response = self.client.get('/api/acts/conflicts/', {**self.params, 'exclude': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_duration_is_bounded(self):
+        response = self.client.post('/api/acts/', {
+            'date_time': self.params['date_time'], 'duration': '2 00:00:00', 'act_type': Act.ACT_TYPES[0][0],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('duration', response.json())
+
+
+class ImporterTests(TestCase):
+    """
+    Итоги загрузки и восстановление производных данных.
+    """
+
+    def test_conflicting_rows_are_skipped(self):
+        existing = Client.objects.create(first_name='Есть', phone='1')
+        rows = [
+            {'id': str(existing.pk), 'first_name': 'Повтор', 'phone': '2'},
+            {'id': '', 'first_name': 'Новый', 'phone': '3'},
+        ]
+        summary = transfer.Importer(Client).run(rows)
+        self.assertEqual((summary['processed'], summary['written'], summary['skipped']), (2, 1, 1))
+        existing.refresh_from_db()
+        self.assertEqual(existing.first_name, 'Есть')
+
+    def test_derived_data_refreshed_after_failed_batch(self):
+        def rows():
+            yield {'first_name': 'Первый', 'phone': '1'}
+            raise OSError('read failed')
+
+        importer = transfer.Importer(Client, batch_size=1)
+        with mock.patch.object(transfer, 'refresh_derived_data') as refresh, self.assertRaises(OSError):
+            importer.run(rows())
+        refresh.assert_called_once_with(Client, importer.written_ids)
+        self.assertEqual(importer.written, 1)
+        self.assertEqual(len(importer.written_ids), 1)
+
+    def test_existing_ids_checked_by_primary_key(self):
+        existing = Client.objects.create(first_name='Есть', phone='1')
+        rows = [
+            {'id': str(existing.pk), 'first_name': 'Повтор', 'phone': '2'},
+            {'id': str(existing.pk + 1), 'first_name': 'Новый', 'phone': '3'},
+            {'id': str(existing.pk + 1), 'first_name': 'Дубль', 'phone': '4'},
+        ]
+        with CaptureQueriesContext(connection) as context:
+            summary = transfer.Importer(Client).run(rows)
+        self.assertEqual((summary['written'], summary['skipped']), (1, 2))
+        self.assertFalse([query for query in context.captured_queries if 'COUNT(' in query['sql']])
+        self.assertEqual(Client.objects.get(pk=existing.pk + 1).first_name, 'Новый')
+
+    def test_other_unique_conflicts_are_skipped(self):
+        offer, need = create_rows(1)
+        other_need = Need.objects.create(
+            client=need.client, realtor=need.realtor, property_type=need.property_type, min_price=1, max_price=2000,
+        )
+        rows = [
+            {'need_id': str(need.pk), 'offer_id': str(offer.pk), 'created_at': '2024-01-01T00:00:00'},
+            {'need_id': str(other_need.pk), 'offer_id': str(offer.pk), 'created_at': '2024-01-01T00:00:00'},
+        ]
+        summary = transfer.Importer(Deal).run(rows)
+        self.assertEqual((summary['written'], summary['skipped']), (0, 2))
+
+    def test_matches_refreshed_for_imported_rows_only(self):
+        offer, need = create_rows(1)
+        Match.objects.all().delete()
+        rows = [{
+            'client_id': str(need.client_id), 'realtor_id': str(need.realtor_id), 'property_type': need.property_type,
+            'min_price': '1', 'max_price': '2000',
+        }]
+        importer = transfer.Importer(Need)
+        importer.run(rows)
+        self.assertEqual(
+            list(Match.objects.values_list('need_id', 'offer_id')), [(importer.written_ids[0], offer.pk)],
+        )
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Состояние маршрутизации доступно потоковому ответу во время чтения.
+    """
+
+    def _view(self, request):
+        routers.use_replica_for_reads()
+
+        def content():
+            state = routers._state.get()
+            yield str(state is not None and state.replica_reads)
+
+        return StreamingHttpResponse(content())
+
+    def test_state_kept_while_streaming(self):
+        response = routers.ReplicaStickinessMiddleware(self._view)(RequestFactory().get('/'))
+        self.assertIsNone(routers._state.get())
+        self.assertEqual(b''.join(response.streaming_content), b'True')
+        self.assertIsNone(routers._state.get())
+
+    def test_state_kept_while_streaming_async(self):
+        async def view(request):
+            routers.use_replica_for_reads()
+
+            async def content():
+                state = routers._state.get()
+                yield str(state is not None and state.replica_reads)
+
+            return StreamingHttpResponse(content())
+
+        async def consume():
+            response = await routers.ReplicaStickinessMiddleware(view)(RequestFactory().get('/'))
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(async_to_sync(consume)(), b'True')
+
+
+class ReplicaDatabaseTests(TransactionTestCase):
+    """
+    Маршрутизация между основной базой и репликой — отдельным файлом SQLite,
+    который обновляется только явным копированием, как командой replicate_db.
+    """
+
+    # Реплика добавляется в setUpClass, после создания тестовых баз: '__all__'
+    # раскрывается в список псевдонимов уже вместе с ней
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        primary = connections.settings[DEFAULT_DB_ALIAS]
+        replica = {**primary, 'NAME': os.path.join(directory.name, 'replica.sqlite3'), 'TEST': {**primary['TEST'], 'NAME': None}}
+        patcher = mock.patch.dict(connections.settings, {routers.REPLICA_ALIAS: replica})
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.addClassCleanup(lambda: connections[routers.REPLICA_ALIAS].close())
+        super().setUpClass()
+
+    def setUp(self):
+        caches[RESPONSE_CACHE_ALIAS].clear()
+        Client.objects.create(first_name='Первый', phone='1')
+        self._replicate()
+        # Запись, которой реплика ещё не видит
+        Client.objects.create(first_name='Второй', phone='2')
+
+    def _replicate(self):
+        connection.ensure_connection()
+        target = sqlite3.connect(connections.settings[routers.REPLICA_ALIAS]['NAME'])
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def test_router(self):
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_read(Client), routers.PRIMARY_ALIAS)
+        state = routers._RoutingState(pinned=False)
+        token = routers._state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Client), routers.PRIMARY_ALIAS)
+            routers.use_replica_for_reads()
+            self.assertEqual(router.db_for_read(Client), routers.REPLICA_ALIAS)
+            self.assertEqual(router.db_for_write(Client), routers.PRIMARY_ALIAS)
+            self.assertTrue(state.wrote)
+            # После записи запрос читает свои изменения из основной базы
+            self.assertEqual(router.db_for_read(Client), routers.PRIMARY_ALIAS)
+        finally:
+            routers._state.reset(token)
+
+    def test_reads_from_replica(self):
+        response = self.client.get('/api/clients/')
+        self.assertEqual([client['first_name'] for client in response.json()], ['Первый'])
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+    def test_write_sets_sticky_cookie(self):
+        response = self.client.post('/api/clients/', {'first_name': 'Третий', 'phone': '3'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        # Cookie сохраняется в тестовом клиенте: следующее чтение идёт в основную базу
+        self.assertEqual(len(self.client.get('/api/clients/').json()), 3)
+
+    def test_replica_responses_not_cached(self):
+        self.client.get('/api/clients/')
+        self.client.cookies[routers.STICKY_COOKIE] = '1'
+        response = self.client.get('/api/clients/')
+        self.assertEqual(len(response.json()), 2)
+
+
+class AsyncViewsTests(TransactionTestCase):
+    """
+    Асинхронные варианты действий отдают те же данные, что и синхронные.
+    Запросы асинхронных представлений идут из потоков пула, поэтому данные фиксируются.
+    """
+
+    def setUp(self):
+        self.offer, self.need = create_rows(2)
+        Property.objects.filter(pk=self.offer.property_id).update(
+            latitude=55.75, longitude=37.61, image='properties/a.jpg',
+            image_variants={'source': 'properties/a.jpg', 'thumb': 'properties/a_thumb.webp'},
+        )
+        property = Property.objects.get(pk=self.offer.property_id)
+        # update() обходит сигналы, индексы обновляются вручную
+        property_address_index.update(property)
+        property_grid_index.update(property)
+
+    def test_payloads_match(self):
+        pairs = [
+            ('/api/clients/search/?query=Клиент', '/api/async/clients/search/?query=Клиент'),
+            ('/api/realtors/search/?query=Риелтор', '/api/async/realtors/search/?query=Риелтор'),
+            ('/api/properties/search_by_address/?query=Город', '/api/async/properties/search_by_address/?query=Город'),
+            ('/api/properties/nearby/?lat=55.75&lon=37.61', '/api/async/properties/nearby/?lat=55.75&lon=37.61'),
+            (
+                '/api/properties/search_in_region/?coordinates=55,37&coordinates=56,37&coordinates=56,38',
+                '/api/async/properties/search_in_region/?coordinates=55,37&coordinates=56,37&coordinates=56,38',
+            ),
+            (f'/api/offers/{self.offer.pk}/matching-needs/', f'/api/async/offers/{self.offer.pk}/matching-needs/'),
+            (f'/api/needs/{self.need.pk}/matching-offers/', f'/api/async/needs/{self.need.pk}/matching-offers/'),
+            (
+                f'/api/offers/{self.offer.pk}/matching-needs/?rank=1',
+                f'/api/async/offers/{self.offer.pk}/matching-needs/?rank=1',
+            ),
+        ]
+        for sync_url, async_url in pairs:
+            with self.subTest(url=sync_url):
+                sync_response = self.client.get(sync_url)
+                async_response = self.client.get(async_url)
+                self.assertEqual(sync_response.status_code, 200)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_errors_match(self):
+        queries = [
+            'properties/search_by_address/?query=Город&limit=abc',
+            'properties/search_by_address/?query=Город&limit=0',
+            'properties/nearby/?lat=55.75',
+            'properties/nearby/?lat=nan&lon=37.61',
+            'properties/nearby/?lat=95&lon=37.61',
+            'properties/nearby/?lat=55.75&lon=37.61&k=0',
+            'properties/search_in_region/',
+            'properties/search_in_region/?coordinates=55,37&coordinates=56,37',
+            'properties/search_in_region/?coordinates=55,37&coordinates=x,37&coordinates=56,38',
+            'properties/search_in_region/?coordinates=0,0&coordinates=1,1&coordinates=0,1&coordinates=1,0',
+            f'offers/{self.offer.pk}/matching-needs/?rank=1&k=abc',
+            f'needs/{self.need.pk}/matching-offers/?rank=true&k=-1',
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                sync_response = self.client.get(f'/api/{query}')
+                async_response = self.client.get(f'/api/async/{query}')
+                self.assertEqual(sync_response.status_code, 400)
+                self.assertEqual(async_response.status_code, 400)
+                self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_image_urls_are_absolute(self):
+        data = self.client.get('/api/properties/nearby/?lat=55.75&lon=37.61').json()
+        self.assertTrue(data[0]['image'].startswith('http://testserver/'))
+        self.assertTrue(data[0]['image_variants']['thumb'].startswith('http://testserver/'))
+
+
+class FulltextTests(TestCase):
+    """
+    Полнотекстовый поиск ?q= без учёта регистра, в том числе для коротких слов.
+    """
+
+    def setUp(self):
+        self.ivanov = Client.objects.create(last_name='Иванов', first_name='Пётр', phone='1').pk
+        self.petrov = Client.objects.create(last_name='Петров', first_name='Иван', phone='2').pk
+        Client.objects.create(last_name='Сидоров', first_name='Олег', phone='3')
+
+    def _found(self, query):
+        return sorted(client['id'] for client in self.client.get('/api/clients/', {'q': query}).json())
+
+    def test_cyrillic_case_is_ignored(self):
+        cases = {
+            # Короче трёх символов — поиск подстроки без индекса
+            'ив': [self.ivanov, self.petrov],
+            'ИВ': [self.ivanov, self.petrov],
+            'иванов': [self.ivanov],
+            'ИВАНОВ': [self.ivanov],
+            'петров ив': [self.petrov],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self._found(query), expected)
+
+    def test_index_follows_writes_bypassing_signals(self):
+        Client.objects.bulk_create([Client(last_name='Кузнецов', first_name='Ян', phone='4')])
+        kuznetsov = Client.objects.get(last_name='Кузнецов').pk
+        self.assertEqual(self._found('кузнецов'), [kuznetsov])
+
+        Client.objects.filter(pk=kuznetsov).update(last_name='Смирнов')
+        self.assertEqual(self._found('кузнецов'), [])
+        self.assertEqual(self._found('смирнов'), [kuznetsov])
+
+        Client.objects.filter(pk=kuznetsov).delete()
+        self.assertEqual(self._found('смирнов'), [])
+
+    def test_triggers_restored_after_migrate(self):
+        # Так триггеры пропадают, когда миграция SQLite пересоздаёт таблицу
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER api_client_fts_au')
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=DEFAULT_DB_ALIAS)
+
+        Client.objects.filter(pk=self.ivanov).update(last_name='Смирнов')
+        self.assertEqual(self._found('смирнов'), [self.ivanov])
+
+
+class AddressIndexTests(TestCase):
+    """
+    Нечёткий поиск по адресу.
+    """
+
+    def setUp(self):
+        self.index = AddressIndex(Property)
+        self.moscow = Property.objects.create(property_type=PropertyType.APARTMENT, city='Москва', street='Ленина', area=50).pk
+        Property.objects.create(property_type=PropertyType.HOUSE, city='Тюмень', street='Мира', area=90)
+
+    def test_typo_in_city(self):
+        self.assertEqual([pk for pk, _ in self.index.search('моксва')], [self.moscow])
+
+    def test_distances_computed_outside_lock(self):
+        free = []
+        compute = search_module._min_distances
+
+        def min_distances(*args):
+            # Другой поток может взять блокировку индекса, пока считаются расстояния
+            def try_lock():
+                acquired = self.index._lock.acquire(blocking=False)
+                if acquired:
+                    self.index._lock.release()
+                free.append(acquired)
+
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+            return compute(*args)
+
+        with mock.patch.object(search_module, '_min_distances', side_effect=min_distances) as patched:
+            self.index.search('москва')
+        self.assertEqual(patched.call_count, len(AddressIndex.COLUMNS))
+        self.assertTrue(all(free))
+
+
+class MatchCountsTests(TestCase):
+    """
+    Количество совпадений.
+    """
+
+    def test_counts(self):
+        offer, need = create_rows(3)
+        data = self.client.get('/api/matches/counts/', {'need': need.pk, 'offer': offer.pk}).json()
+        self.assertEqual((data['total'], data['need'], data['offer']), (5, 3, 3))
+
+    def test_invalid_ids(self):
+        for params in ({'need': 'abc'}, {'offer': '1.5'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/matches/counts/', params).status_code, 400)
+
+
+class BulkTests(TestCase):
+    """
+    Пакетные POST, PATCH и DELETE <ресурс>/bulk/.
+    """
+
+    def setUp(self):
+        self.offer, self.need = create_rows(2)
+
+    def _bulk(self, method, url, rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, rows, content_type='application/json')
+
+    def _offer_rows(self, count, price=1000):
+        properties = Property.objects.bulk_create([
+            Property(property_type=PropertyType.APARTMENT, city='Город', street='Улица', area=50)
+            for _ in range(count)
+        ])
+        return [
+            {'client': self.offer.client_id, 'realtor': self.offer.realtor_id, 'property': property.pk, 'price': price}
+            for property in properties
+        ]
+
+    def test_create_skips_invalid_rows(self):
+        rows = self._offer_rows(2)
+        rows.insert(1, {**rows[0], 'client': 10 ** 9})
+        rows.append({'price': 1})
+        response = self._bulk('post', '/api/offers/bulk/', rows)
+
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(len(data['created']), 2)
+        self.assertEqual([error['index'] for error in data['errors']], [1, 3])
+        self.assertIn('client', data['errors'][0]['errors'])
+        self.assertEqual(Offer.objects.filter(pk__in=data['created']).count(), 2)
+
+    def test_create_prefetches_relations(self):
+        counts = []
+        for count in (2, 20):
+            rows = self._offer_rows(count)
+            with CaptureQueriesContext(connection) as context:
+                self._bulk('post', '/api/offers/bulk/', rows)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_create_refreshes_matches(self):
+        data = self._bulk('post', '/api/offers/bulk/', self._offer_rows(1) + self._offer_rows(1, price=10 ** 9)).json()
+        matching, too_expensive = data['created']
+        self.assertTrue(Match.objects.filter(offer_id=matching, need=self.need).exists())
+        self.assertFalse(Match.objects.filter(offer_id=too_expensive).exists())
+
+    def test_create_updates_name_index(self):
+        data = self._bulk('post', '/api/clients/bulk/', [{'last_name': 'Ёлкин', 'first_name': 'Ян', 'phone': '9'}]).json()
+        self.assertEqual(client_name_index.search('Ёлкин'), data['created'])
+
+    def test_update_refreshes_indexes_and_caches(self):
+        property = self.offer.property
+        deal = Deal.objects.get(offer=self.offer)
+        commissions.cached_commissions(deal.pk)
+        generation = current_generations([Property])
+
+        response = self._bulk('patch', '/api/properties/bulk/', [
+            {'id': property.pk, 'city': 'Мурманск', 'latitude': 68.97, 'longitude': 33.07},
+            {'id': 10 ** 9, 'city': 'Нигде'},
+        ])
+
+        self.assertEqual(response.json()['updated'], [property.pk])
+        self.assertEqual(response.json()['errors'][0]['index'], 1)
+        self.assertEqual(property_address_index.search('мурманск')[0][0], property.pk)
+        self.assertEqual([pk for pk, _ in property_grid_index.nearby(68.97, 33.07, 1, 5)], [property.pk])
+        version = caches[commissions.CACHE_ALIAS].get(commissions._version_key(deal.pk))
+        self.assertTrue(version.startswith('reset:'))
+        self.assertNotEqual(current_generations([Property]), generation)
+
+    def test_update_price_refreshes_matches(self):
+        self._bulk('patch', '/api/offers/bulk/', [{'id': self.offer.pk, 'price': 10 ** 9}])
+        self.assertFalse(Match.objects.filter(offer=self.offer).exists())
+
+    def test_delete_keeps_blocked_rows(self):
+        free_client = Client.objects.create(first_name='Свободный', phone='0')
+        response = self._bulk('delete', '/api/clients/bulk/', [free_client.pk, self.offer.client_id, 10 ** 9])
+
+        data = response.json()
+        self.assertEqual(data['deleted'], [free_client.pk])
+        self.assertEqual([error['index'] for error in data['errors']], [1, 2])
+        self.assertTrue(Client.objects.filter(pk=self.offer.client_id).exists())
+        self.assertEqual(client_name_index.search('Свободный'), [])
+
+    def test_expects_list(self):
+        self.assertEqual(self._bulk('post', '/api/offers/bulk/', {'price': 1}).status_code, 400)
+
+
+class MediaTests(SimpleTestCase):
+    """
+    Отдача медиафайлов: диапазоны, условные запросы и Cache-Control.
+    """
+
+    content = bytes(range(256)) * 4
+    hashed_name = '0123456789abcdef0123_thumb.jpg'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name in ('plan.pdf', self.hashed_name):
+            with open(os.path.join(directory.name, name), 'wb') as file:
+                file.write(self.content)
+        override = override_settings(MEDIA_ROOT=directory.name, MEDIA_ACCEL_REDIRECT=None)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _get(self, name='plan.pdf', **headers):
+        return self.client.get(f'/media/{name}', headers=headers)
+
+    def test_range(self):
+        response = self._get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_suffix_range(self):
+        response = self._get(Range='bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-100:])
+        self.assertEqual(response['Content-Range'], f'bytes {len(self.content) - 100}-{len(self.content) - 1}/{len(self.content)}')
+
+    def test_start_past_end_is_unsatisfiable(self):
+        response = self._get(Range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self._get(Range='bytes=10-19', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_matching_if_range_returns_range(self):
+        etag = self._get()['ETag']
+        response = self._get(Range='bytes=0-0', **{'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[:1])
+
+    def test_if_none_match(self):
+        etag = self._get()['ETag']
+        response = self._get(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_cache_control(self):
+        self.assertEqual(self._get(self.hashed_name)['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(self._get()['Cache-Control'], media.REVALIDATE_CACHE_CONTROL)
+
+    def test_parse_range(self):
+        self.assertIsNone(media._parse_range('bytes=0-1,5-6', 10))
+        self.assertIsNone(media._parse_range('bytes=5-2', 10))
+        self.assertEqual(media._parse_range('bytes=5-100', 10), (5, 9))
+        self.assertEqual(media._parse_range('bytes=-100', 10), (0, 9))
+        with self.assertRaises(media._UnsatisfiableRange):
+            media._parse_range('bytes=-0', 10)
@@ -0,0 +1,333 @@
+import csv
+import datetime
+import json
+
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+
+from .caching import bump_generation
+from .commissions import CACHE_ALIAS
+from .geo import property_grid_index
+from .images import generate_variants, needs_variants
+from .matching import refresh_batch_matches
+from .models import Act, Client, Deal, Need, Offer, Property, Realtor
+from .search import client_name_index, property_address_index, realtor_name_index
+
+# Набор данных -> модель, в порядке загрузки с учётом внешних ключей
+DATASETS = {
+    'clients': Client,
+    'realtors': Realtor,
+    'properties': Property,
+    'offers': Offer,
+    'needs': Need,
+    'deals': Deal,
+    'acts': Act,
+}
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+ON_CONFLICT = ('ignore', 'update')
+# Сколько ошибок строк возвращается в отчёте; остальные только подсчитываются
+MAX_REPORTED_ERRORS = 100
+# Размер пакета id при проверке внешних ключей (ограничение SQLite на число параметров)
+LOOKUP_BATCH_SIZE = 900
+
+
+def guess_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# Производные столбцы, которые не переносятся, а строятся заново после загрузки
+DERIVED_COLUMNS = {'image_variants'}
+
+
+def columns(model):
+    """
+    Столбцы файла: все хранимые поля модели, внешние ключи — в виде <поле>_id.
+    """
+    return [field.attname for field in model._meta.concrete_fields if field.attname not in DERIVED_COLUMNS]
+
+
+class _JSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder без округления времени до миллисекунд, чтобы выгрузка загружалась без потерь.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class _Echo:
+    """
+    Псевдофайл для csv.writer: writerow возвращает строку вместо записи.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_chunks(model, file_format, chunk_size=2000):
+    """
+    Генератор фрагментов файла выгрузки по chunk_size строк.
+    Записи читаются через iterator(), поэтому расход памяти не зависит от размера таблицы.
+    """
+    names = columns(model)
+    rows = model.objects.order_by('pk').values_list(*names).iterator(chunk_size=chunk_size)
+
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        lines = [writer.writerow(names)]
+        format_row = writer.writerow
+    else:
+        lines = []
+        format_row = lambda row: json.dumps(dict(zip(names, row)), cls=_JSONEncoder, ensure_ascii=False) + '\n'
+
+    for row in rows:
+        lines.append(format_row(row))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def read_rows(stream, file_format):
+    """
+    Читает строки текстового потока как словари; нечитаемая строка JSONL возвращается как None.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def refresh_derived_data(model, pks):
+    """
+    Восстанавливает то, что при обычной записи поддерживают сигналы:
+    индексы поиска, таблицу совпадений, флаги is_active, кэши комиссий и ответов.
+    pks — id записанных строк: совпадения пересчитываются только для них.
+    """
+    if model is Client:
+        client_name_index.reset()
+    elif model is Realtor:
+        realtor_name_index.reset()
+    elif model is Property:
+        property_address_index.reset()
+        property_grid_index.reset()
+        # Копии изображений строятся в фоновом пуле и не задерживают загрузку
+        for property in Property.objects.exclude(image='').exclude(image__isnull=True).only('image', 'image_variants').iterator():
+            if needs_variants(property):
+                generate_variants(property)
+    elif model is Deal:
+        for participant in (Need, Offer):
+            participant.objects.filter(deal__isnull=False, is_active=True).update(is_active=False)
+            participant.objects.filter(deal__isnull=True, is_active=False).update(is_active=True)
+
+    if model in (Property, Offer, Need):
+        with transaction.atomic():
+            for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+                chunk = pks[start:start + LOOKUP_BATCH_SIZE]
+                if model is Need:
+                    refresh_batch_matches(need_ids=chunk)
+                elif model is Offer:
+                    refresh_batch_matches(offer_ids=chunk)
+                else:
+                    # Тип недвижимости влияет на совпадения её предложений
+                    refresh_batch_matches(offer_ids=list(Offer.objects.filter(property_id__in=chunk).values_list('id', flat=True)))
+    if model in (Realtor, Property, Offer, Need, Deal):
+        caches[CACHE_ALIAS].clear()
+    bump_generation(model, *((Need, Offer) if model is Deal else ()))
+
+
+class Importer:
+    """
+    Потоковая загрузка строк в модель пакетами bulk_create, по транзакции на пакет.
+    on_conflict: 'ignore' — строки с уже существующим id (или нарушающие другое ограничение
+    уникальности) пропускаются и считаются в skipped, 'update' — существующие записи
+    перезаписываются значениями из файла.
+    progress вызывается после каждого пакета с числом обработанных, записанных и ошибочных строк.
+    """
+
+    def __init__(self, model, on_conflict='ignore', batch_size=5000, progress=None):
+        if on_conflict not in ON_CONFLICT:
+            raise ValueError(on_conflict)
+        self.model = model
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size
+        self.progress = progress
+        self.fields = {name: model._meta.get_field(name) for name in columns(model)}
+        self.required = [
+            name for name, field in self.fields.items()
+            if not (field.primary_key or field.null or field.blank or field.has_default())
+        ]
+        self.processed = 0
+        self.written = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+        # id записанных строк для пересчёта совпадений после загрузки
+        self.written_ids = []
+
+    def run(self, rows):
+        batch = []
+        try:
+            for number, row in enumerate(rows, 1):
+                batch.append((number, row))
+                if len(batch) == self.batch_size:
+                    self._flush(batch)
+                    batch = []
+            if batch:
+                self._flush(batch)
+        finally:
+            # Уже зафиксированные пакеты остаются в базе и при ошибке в следующем
+            refresh_derived_data(self.model, self.written_ids)
+        return self.summary()
+
+    def summary(self):
+        return {
+            'processed': self.processed,
+            'written': self.written,
+            'skipped': self.skipped,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def _error(self, number, messages):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': messages})
+
+    def _convert(self, row):
+        if not isinstance(row, dict):
+            raise ValidationError('Некорректная строка.')
+        values, errors = {}, {}
+        for name, value in row.items():
+            field = self.fields.get(name)
+            if field is None:
+                continue
+            # Пустой id в CSV означает новую запись с автоматическим id
+            if value == '' and (field.null or field.primary_key):
+                value = None
+            try:
+                if field.is_relation:
+                    # Существование связанных объектов проверяется пакетом в _check_relations
+                    value = field.target_field.to_python(value)
+                    if value is None and not field.null:
+                        raise ValidationError(field.error_messages['null'])
+                else:
+                    value = field.clean(value, None)
+            except ValidationError as error:
+                errors[name] = error.messages
+            else:
+                values[name] = value
+        for name in self.required:
+            if name not in values and name not in errors:
+                errors[name] = ['Обязательное поле.']
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def _check_relations(self, rows):
+        """
+        Отбрасывает строки со ссылками на несуществующие объекты — одним запросом
+        на каждый внешний ключ и пакет id.
+        """
+        for field in self.fields.values():
+            if not field.is_relation:
+                continue
+            pks = list({values.get(field.attname) for _, values in rows} - {None})
+            existing = set()
+            for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+                existing.update(
+                    field.related_model._base_manager
+                    .filter(pk__in=pks[start:start + LOOKUP_BATCH_SIZE])
+                    .values_list('pk', flat=True)
+                )
+            valid = []
+            for number, values in rows:
+                pk = values.get(field.attname)
+                if pk is None or pk in existing:
+                    valid.append((number, values))
+                else:
+                    self._error(number, {field.attname: [f'Объект с id={pk} не существует.']})
+            rows = valid
+        return rows
+
+    def _flush(self, batch):
+        rows = []
+        for number, row in batch:
+            try:
+                rows.append((number, self._convert(row)))
+            except ValidationError as error:
+                self._error(number, error.message_dict if hasattr(error, 'error_dict') else error.messages)
+        rows = self._check_relations(rows)
+        valid = len(rows)
+
+        pk_name = self.model._meta.pk.attname
+        objects = self.model._base_manager
+        update_fields = {name for _, values in rows for name in values} - {pk_name}
+        update = self.on_conflict == 'update' and update_fields
+        if not update:
+            # Строки с уже существующим id пропускаются: проверка одним запросом
+            # по первичному ключу на LOOKUP_BATCH_SIZE id, а не COUNT(*) всей таблицы
+            pks = list({values[pk_name] for _, values in rows if values.get(pk_name) is not None})
+            taken = set()
+            for start in range(0, len(pks), LOOKUP_BATCH_SIZE):
+                taken.update(objects.filter(pk__in=pks[start:start + LOOKUP_BATCH_SIZE]).values_list('pk', flat=True))
+            fresh = []
+            for number, values in rows:
+                pk = values.get(pk_name)
+                if pk is None or pk not in taken:
+                    fresh.append((number, values))
+                    taken.add(pk)
+            rows = fresh
+
+        instances = [self.model(**values) for _, values in rows]
+        with transaction.atomic():
+            if update:
+                objects.bulk_create(
+                    instances, update_conflicts=True, unique_fields=['pk'], update_fields=sorted(update_fields),
+                )
+            else:
+                instances = self._insert(instances)
+        written = len(instances)
+        self.written_ids.extend(instance.pk for instance in instances)
+
+        self.processed += len(batch)
+        self.written += written
+        self.skipped += valid - written
+        if self.progress is not None:
+            self.progress(self.processed, self.written, self.error_count)
+
+    def _insert(self, instances):
+        """
+        Вставляет новые строки и возвращает записанные. Если пакет нарушает другое
+        ограничение уникальности, строки вставляются по одной и нарушающие пропускаются.
+        """
+        objects = self.model._base_manager
+        try:
+            with transaction.atomic():
+                return objects.bulk_create(instances)
+        except IntegrityError:
+            pass
+        written = []
+        for instance in instances:
+            try:
+                with transaction.atomic():
+                    objects.bulk_create([instance])
+            except IntegrityError:
+                continue
+            written.append(instance)
+        return written
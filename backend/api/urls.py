@@ -1,8 +1,7 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import ClientViewSet, DealViewSet, ActViewSet, NeedViewSet, PropertyViewSet,OfferViewSet, RealtorViewSet
-from django.conf import settings
-from django.conf.urls.static import static
+from . import async_views
+from .views import ClientViewSet, DealViewSet, ActViewSet, MatchViewSet, NeedViewSet, PropertyViewSet,OfferViewSet, RealtorViewSet, TransferViewSet
 
 # Создание маршрутизаторов для viewset
 router = DefaultRouter()
@@ -13,6 +12,8 @@ router.register(r'offers', OfferViewSet, basename='offer')
 router.register(r'needs', NeedViewSet, basename='need')
 router.register(r'deals', DealViewSet, basename='deal')
 router.register(r'acts', ActViewSet)
+router.register(r'matches', MatchViewSet, basename='match')
+router.register(r'transfer', TransferViewSet, basename='transfer')
 
 urlpatterns = [
     # Включаем маршруты, созданные автоматически с помощью DefaultRouter
@@ -20,4 +21,12 @@ urlpatterns = [
     # Дополнительные пути для кастомных действий
     path('properties/search/address/', PropertyViewSet.as_view({'get': 'search_by_address'}), name='property-search-by-address'),
     path('properties/search/polygon/', PropertyViewSet.as_view({'get': 'search_in_region'}), name='property-search-by-polygon'),
+    # Асинхронные варианты поиска и подбора (для запуска под ASGI), ответы те же, что у действий viewset
+    path('async/clients/search/', async_views.client_search, name='async-client-search'),
+    path('async/realtors/search/', async_views.realtor_search, name='async-realtor-search'),
+    path('async/properties/search_by_address/', async_views.property_search_by_address, name='async-property-search-by-address'),
+    path('async/properties/nearby/', async_views.property_nearby, name='async-property-nearby'),
+    path('async/properties/search_in_region/', async_views.property_search_in_region, name='async-property-search-in-region'),
+    path('async/offers/<int:pk>/matching-needs/', async_views.offer_matching_needs, name='async-offer-matching-needs'),
+    path('async/needs/<int:pk>/matching-offers/', async_views.need_matching_offers, name='async-need-matching-offers'),
 ] 
@@ -1,26 +1,68 @@
 import datetime
+import io
 from django.forms import ValidationError
-import django_filters
-from rest_framework.decorators import api_view
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import  Act, Client, Deal, Need, Offer,Property, Realtor
+from .models import  Act, Client, Deal, Match, Need, Offer,Property, Realtor
 from .serializers import ActSerializer, ClientSerializer, DealSerializer, NeedSerializer, OfferSerializer, RealtorSerializer,PropertySerializer
-from geopy.distance import geodesic
-from shapely.geometry import Point, Polygon
-import Levenshtein
-from rest_framework import filters ,viewsets,status
-from rest_framework.exceptions import NotFound
-from django.db.models import Q
+from .bulk import BulkMixin
+from .caching import CachedResponseMixin
+from .commissions import cached_commissions, commission_report
+from . import fulltext
+from .geo import filter_inside, property_grid_index
+from .pagination import IdCursorPagination, StreamingListMixin
+from .params import InvalidParameter, parse_limit, parse_nearby, parse_polygon, parse_rank
+from .ranking import rank_needs, rank_offers
+from .routers import ReplicaReadMixin
+from .search import client_name_index, property_address_index, realtor_name_index
+from .transfer import CONTENT_TYPES, DATASETS, ON_CONFLICT, Importer, export_chunks, guess_format, read_rows
+from rest_framework import viewsets, status
+from rest_framework.exceptions import NotFound, ParseError
+from django.db import IntegrityError
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime, parse_duration
 from rest_framework.parsers import MultiPartParser, FormParser
 
-class ClientViewSet(viewsets.ModelViewSet):
+def _parse_boundary(value, end=False):
+    """
+    Разбирает границу периода: дату (ГГГГ-ММ-ДД) или дату и время в формате ISO 8601.
+    Дата как конец периода включается целиком, то есть переходит в начало следующего дня.
+    Возвращает datetime с часовым поясом; при неверном формате бросает ValueError.
+    """
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class ClientViewSet(BulkMixin, ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления клиентами: создание, обновление и удаление клиентов.
     """
+    cache_models = (Client,)
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
 
+    def get_queryset(self):
+        """
+        q — полнотекстовый поиск по ФИО с ранжированием BM25.
+        """
+        queryset = super().get_queryset()
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = fulltext.search(queryset, query)
+        return queryset
+
     def create(self, request, *args, **kwargs):
         """
         Создание нового клиента.
@@ -65,42 +107,36 @@ class ClientViewSet(viewsets.ModelViewSet):
         ):
             return False
         return True
+
+    def bulk_delete_errors(self, clients):
+        """
+        Клиенты, связанные с потребностью или предложением, — двумя запросами на весь пакет.
+        """
+        linked = set(Need.objects.filter(client__in=clients).values_list('client_id', flat=True))
+        linked |= set(Offer.objects.filter(client__in=clients).values_list('client_id', flat=True))
+        return {pk: "Клиент связан с существующей потребностью или предложением." for pk in linked}
     
     @action(detail=False, methods=['get'], url_path='search')
     def search(self, request):
         """
-        Поиск клиентов по ФИО с использованием расстояния Левенштейна.
+        Поиск клиентов по ФИО с использованием расстояния Левенштейна
+        по индексу частей ФИО.
         """
         search_query = request.query_params.get('query', '').strip()
 
         if not search_query:
             return Response({'error': 'Query parameter is required'}, status=400)
 
-        search_parts = search_query.lower().split()
-        matching_clients = []
-
-        for client in Client.objects.all():
-            client_parts = [client.first_name, client.last_name, client.patronymic]
-            client_parts = [part.lower() for part in client_parts if part]
-
-            if self._is_match(search_parts, client_parts):
-                matching_clients.append(client)
-
+        matching_clients = client_name_index.search_objects(search_query)
         serializer = self.get_serializer(matching_clients, many=True)
         return Response(serializer.data)
 
-    def _is_match(self, search_parts, client_parts):
-        for search_part in search_parts:
-            for client_part in client_parts:
-                if Levenshtein.distance(search_part, client_part) <= 3:
-                    return True
-        return False
-
 
-class RealtorViewSet(viewsets.ModelViewSet):
+class RealtorViewSet(ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet для управления риэлторами: создание, обновление и удаление риэлторов.
     """
+    cache_models = (Realtor,)
     queryset = Realtor.objects.all()
     serializer_class = RealtorSerializer
 
@@ -150,34 +186,20 @@ class RealtorViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='search')
     def search(self, request):
         """
-        Поиск риэлторов по ФИО с использованием расстояния Левенштейна.
+        Поиск риэлторов по ФИО с использованием расстояния Левенштейна
+        по индексу частей ФИО.
         """
         search_query = request.query_params.get('query', '').strip()
 
         if not search_query:
             return Response({'error': 'Query parameter is required'}, status=400)
 
-        search_parts = search_query.lower().split()
-        matching_realtors = []
-
-        for realtor in Realtor.objects.all():
-            realtor_parts = [realtor.first_name, realtor.last_name, realtor.patronymic]
-            realtor_parts = [part.lower() for part in realtor_parts if part]
-
-            if self._is_match(search_parts, realtor_parts):
-                matching_realtors.append(realtor)
-
+        matching_realtors = realtor_name_index.search_objects(search_query)
         serializer = self.get_serializer(matching_realtors, many=True)
         return Response(serializer.data)
 
-    def _is_match(self, search_parts, realtors_parts):
-        for search_part in search_parts:
-            for realtors_part in realtors_parts:
-                if Levenshtein.distance(search_part, realtors_part) <= 3:
-                    return True
-        return False
-
-class PropertyViewSet(viewsets.ModelViewSet):
+class PropertyViewSet(BulkMixin, ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
+    cache_models = (Property,)
     queryset = Property.objects.all()
     serializer_class = PropertySerializer
     parser_classes = [MultiPartParser, FormParser]
@@ -186,6 +208,7 @@ class PropertyViewSet(viewsets.ModelViewSet):
         """
         Переопределенный метод для фильтрации объектов недвижимости
         по типу и адресу, а также поддерживающий поиск по регионам.
+        q — полнотекстовый поиск по адресу с ранжированием BM25.
         """
         queryset = super().get_queryset()
 
@@ -197,12 +220,11 @@ class PropertyViewSet(viewsets.ModelViewSet):
         # Фильтрация по адресу
         address = self.request.query_params.get('address')
         if address:
-            queryset = queryset.filter(
-                Q(city__icontains=address) |
-                Q(street__icontains=address) |
-                Q(house_number__icontains=address) |
-                Q(apartment_number__icontains=address)
-            )
+            queryset = fulltext.contains(queryset, address)
+
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = fulltext.search(queryset, query)
 
         return queryset
     
@@ -211,80 +233,84 @@ class PropertyViewSet(viewsets.ModelViewSet):
     def search_by_address(self, request):
         """
         Нечёткий поиск объектов недвижимости по адресу и типу.
+        Результаты упорядочены по убыванию score; limit ограничивает их количество.
         """
         query = request.query_params.get('query', '').strip().lower()
         if not query:
             return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        query_parts = query.split()
-        properties = Property.objects.all()
-        matching_properties = []
-
-        for property in properties:
-            matches = {
-                'city': property.city or '',
-                'street': property.street or '',
-                'house_number': property.house_number or '',
-                'apartment_number': property.apartment_number or '',
-                'property_type': property.property_type or '',
-            }
-
-            distances = {
-                key: min([Levenshtein.distance(query_part, matches[key].lower()) for query_part in query_parts], default=100)
-                for key in matches
-            }
-
-            if (
-                distances['city'] <= 3 or
-                distances['street'] <= 3 or
-                (distances['house_number'] <= 1 if matches['house_number'] else False) or
-                (distances['apartment_number'] <= 1 if matches['apartment_number'] else False) or
-                distances['property_type'] <= 3
-            ):
-                matching_properties.append(property)
-
-        serializer = PropertySerializer(matching_properties, many=True)
-        return Response(serializer.data)
+        try:
+            limit = parse_limit(request.query_params)
+        except InvalidParameter as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['get'])
-    def search_in_region(self, request):
+        ranked = property_address_index.search_objects(query, limit)
+        serializer = self.get_serializer([property for property, _ in ranked], many=True)
+        data = serializer.data
+        for item, (_, score) in zip(data, ranked):
+            item['score'] = score
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='nearby')
+    def nearby(self, request):
         """
-        Поиск объектов недвижимости внутри района (полигона).
+        Поиск ближайших объектов недвижимости в радиусе radius_km (по умолчанию 5 км)
+        от точки lat/lon. Возвращает не более k объектов (по умолчанию 20) по возрастанию расстояния.
         """
         try:
-            coordinates = request.query_params.getlist('coordinates')
-            if not coordinates:
-                return Response({'error': 'Coordinates are required.'}, status=status.HTTP_400_BAD_REQUEST)
+            latitude, longitude, radius_km, k = parse_nearby(request.query_params)
+        except InvalidParameter as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Преобразование координат в полигон
-            points = [tuple(map(float, point.split(','))) for point in coordinates]
-            if len(points) < 3:
-                return Response({'error': 'At least 3 points are required to form a polygon.'}, status=status.HTTP_400_BAD_REQUEST)
+        nearest = property_grid_index.nearby(latitude, longitude, radius_km, k)
+        properties = Property.objects.in_bulk([pk for pk, _ in nearest])
+        found = [(properties[pk], distance) for pk, distance in nearest if pk in properties]
 
-            polygon = Polygon(points)
+        serializer = self.get_serializer([property for property, _ in found], many=True)
+        data = serializer.data
+        for item, (_, distance) in zip(data, found):
+            item['distance_km'] = round(distance, 3)
+        return Response(data)
 
-            # Поиск объектов внутри полигона
-            properties = Property.objects.filter(location__within=polygon)
-            serializer = PropertySerializer(properties, many=True)
-            return Response(serializer.data)
-        except ValueError:
-            return Response({'error': 'Invalid coordinates format.'}, status=status.HTTP_400_BAD_REQUEST)
+    @action(detail=False, methods=['get'])
+    def search_in_region(self, request):
+        """
+        Поиск объектов недвижимости внутри района (полигона).
+        Каждая точка передаётся параметром coordinates в виде "широта,долгота".
+        """
+        try:
+            polygon = parse_polygon(request.query_params)
+        except InvalidParameter as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Кандидаты из сеточного индекса, затем проверка по актуальным координатам из БД
+        candidate_ids = property_grid_index.within_polygon(polygon)
+        min_lat, min_lon, max_lat, max_lon = polygon.bounds
+        candidates = Property.objects.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lon, max_lon),
+        ).in_bulk(candidate_ids)
+        properties = filter_inside(polygon, [candidates[pk] for pk in candidate_ids if pk in candidates])
+        serializer = self.get_serializer(properties, many=True)
+        return Response(serializer.data)
 
 
 
 
     
-class OfferViewSet(viewsets.ModelViewSet):
+class OfferViewSet(BulkMixin, ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы с предложениями: создание, редактирование, удаление.
     """
+    cache_models = (Offer, Client, Realtor, Property)
     serializer_class = OfferSerializer
 
     def get_queryset(self):
         """
-        Фильтрация предложений по client и realtor (если переданы параметры).
+        Фильтрация предложений по client и realtor (если переданы параметры),
+        available=1 — только предложения вне сделок.
         """
-        queryset = Offer.objects.all()
+        queryset = OfferSerializer.setup_eager_loading(Offer.objects.all())
 
         client_id = self.request.query_params.get('client', None)
         realtor_id = self.request.query_params.get('realtor', None)
@@ -293,6 +319,8 @@ class OfferViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(client__id=client_id)
         if realtor_id:
             queryset = queryset.filter(realtor__id=realtor_id)
+        if self.request.query_params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(is_active=True)
 
         return queryset
 
@@ -305,45 +333,60 @@ class OfferViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Это предложение не может быть удалено, так как является частью сделки.'},
                             status=status.HTTP_400_BAD_REQUEST)
         return super().destroy(request, *args, **kwargs)
+
+    def bulk_delete_errors(self, offers):
+        return {
+            offer.pk: 'Это предложение не может быть удалено, так как является частью сделки.'
+            for offer in offers if offer.is_in_deal()
+        }
     
     @action(detail=True, methods=['get'], url_path='matching-needs')
     def matching_needs(self, request, pk=None):
         """
         Возвращает список потребностей, которые могут быть удовлетворены данным предложением.
+        С параметром rank=1 возвращает k (по умолчанию 20) наиболее подходящих с оценкой score.
         """
         offer = self.get_object()
 
-        matching_needs = Need.objects.filter(
-            property_type=offer.property.property_type,
-            min_price__lte=offer.price,
-            max_price__gte=offer.price,
-        )
-
-        # Дополнительные условия для фильтрации
-        if offer.property.area:
-            matching_needs = matching_needs.filter(
-                Q(min_area__lte=offer.property.area) | Q(min_area__isnull=True),
-                Q(max_area__gte=offer.property.area) | Q(max_area__isnull=True),
-            )
+        matching_needs = Need.objects.filter(matches__offer=offer)
 
-        serializer = NeedSerializer(matching_needs, many=True)
+        try:
+            rank, k = parse_rank(request.query_params)
+        except InvalidParameter as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if rank:
+            ranked = rank_needs(offer, matching_needs, k)
+            needs = NeedSerializer.setup_eager_loading(Need.objects.all()).in_bulk([pk for pk, _ in ranked])
+            data = NeedSerializer([needs[pk] for pk, _ in ranked], many=True, context={'request': request}).data
+            for item, (_, score) in zip(data, ranked):
+                item['score'] = score
+            return Response({
+                'count': matching_needs.count(),
+                'needs': data,
+                'create_deal_endpoint': request.build_absolute_uri('/api/deals/')
+            })
+
+        serializer = NeedSerializer(NeedSerializer.setup_eager_loading(matching_needs), many=True, context={'request': request})
         return Response({
+            'count': len(serializer.data),
             'needs': serializer.data,
             'create_deal_endpoint': request.build_absolute_uri('/api/deals/')
         })
     
-class NeedViewSet(viewsets.ModelViewSet):
+class NeedViewSet(BulkMixin, ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы с потребностями: создание, редактирование, удаление.
     """
+    cache_models = (Need, Client, Realtor)
     
     serializer_class = NeedSerializer
 
     def get_queryset(self):
         """
-        Фильтрация потребностей по client и realtor (если переданы параметры).
+        Фильтрация потребностей по client и realtor (если переданы параметры),
+        available=1 — только потребности вне сделок, q — полнотекстовый поиск по адресу.
         """
-        queryset = Need.objects.all()
+        queryset = NeedSerializer.setup_eager_loading(Need.objects.all())
 
         client_id = self.request.query_params.get('client', None)
         realtor_id = self.request.query_params.get('realtor', None)
@@ -352,6 +395,11 @@ class NeedViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(client__id=client_id)
         if realtor_id:
             queryset = queryset.filter(realtor__id=realtor_id)
+        if self.request.query_params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(is_active=True)
+        query = self.request.query_params.get('q', '').strip()
+        if query:
+            queryset = fulltext.search(queryset, query)
 
         return queryset
 
@@ -364,79 +412,267 @@ class NeedViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Эта потребность учавствует в сделке.'},
                             status=status.HTTP_400_BAD_REQUEST)
         return super().destroy(request, *args, **kwargs)
+
+    def bulk_delete_errors(self, needs):
+        return {need.pk: 'Эта потребность учавствует в сделке.' for need in needs if need.is_in_deal()}
     
     @action(detail=True, methods=['get'], url_path='matching-offers')
     def matching_offers(self, request, pk=None):
         """
         Возвращает список предложений, которые удовлетворяют выбранную потребность.
+        С параметром rank=1 возвращает k (по умолчанию 20) наиболее подходящих с оценкой score.
         """
         need = self.get_object()
 
-        matching_offers = Offer.objects.filter(
-            property__property_type=need.property_type,
-            price__gte=need.min_price,
-            price__lte=need.max_price,
-        )
-
-        # Дополнительные условия для фильтрации
-        if need.min_area:
-            matching_offers = matching_offers.filter(property__area__gte=need.min_area)
-        if need.max_area:
-            matching_offers = matching_offers.filter(property__area__lte=need.max_area)
+        matching_offers = Offer.objects.filter(matches__need=need)
 
-        serializer = OfferSerializer(matching_offers, many=True)
+        try:
+            rank, k = parse_rank(request.query_params)
+        except InvalidParameter as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if rank:
+            ranked = rank_offers(need, matching_offers, k)
+            offers = OfferSerializer.setup_eager_loading(Offer.objects.all()).in_bulk([pk for pk, _ in ranked])
+            data = OfferSerializer([offers[pk] for pk, _ in ranked], many=True, context={'request': request}).data
+            for item, (_, score) in zip(data, ranked):
+                item['score'] = score
+            return Response({
+                'count': matching_offers.count(),
+                'offers': data,
+                'create_deal_endpoint': request.build_absolute_uri('/api/deals/')
+            })
+
+        serializer = OfferSerializer(OfferSerializer.setup_eager_loading(matching_offers), many=True, context={'request': request})
         return Response({
+            'count': len(serializer.data),
             'offers': serializer.data,
             'create_deal_endpoint': request.build_absolute_uri('/api/deals/')
         })
 
-class DealViewSet(viewsets.ModelViewSet):
+class DealViewSet(ReplicaReadMixin, CachedResponseMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы со сделками: создание, редактирование, удаление.
     """
-    queryset = Deal.objects.all()
+    cache_models = (Deal, Need, Offer, Client, Realtor, Property)
+    queryset = DealSerializer.setup_eager_loading(Deal.objects.all())
     serializer_class = DealSerializer
 
-    
-
     def create(self, request, *args, **kwargs):
         """
         Проверяем, можно ли создать сделку.
-        """
+        Повтор запроса с тем же заголовком Idempotency-Key возвращает уже созданную сделку;
+        тот же ключ с другими потребностью или предложением — ошибка 422.
+        """
+        request_key = request.headers.get('Idempotency-Key') or None
+        if request_key:
+            if len(request_key) > Deal._meta.get_field('request_key').max_length:
+                return Response({'error': 'Idempotency-Key is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+            existing = self._existing_deal(request_key)
+            if existing is not None:
+                return existing
+
+        # Параллельный запрос с тем же ключом мог создать сделку уже после проверки выше:
+        # тогда потребность и предложение заняты им, и перед ошибкой ключ проверяется снова
         serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        if not serializer.is_valid():
+            return self._existing_or_error(request_key, serializer.errors)
+        try:
+            serializer.save(request_key=request_key)
+        except IntegrityError:
+            return self._existing_or_error(request_key, {'error': 'Потребность или предложение уже участвуют в сделке.'})
+        except ValidationError as error:
+            return self._existing_or_error(request_key, {'error': error.messages})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def perform_create(self, serializer):
+    def _existing_or_error(self, request_key, error):
+        existing = self._existing_deal(request_key) if request_key else None
+        if existing is not None:
+            return existing
+        return Response(error, status=status.HTTP_400_BAD_REQUEST)
+
+    def _existing_deal(self, request_key):
+        deal = self.get_queryset().filter(request_key=request_key).first()
+        if deal is None:
+            return None
+        requested = (str(self.request.data.get('need')), str(self.request.data.get('offer')))
+        if requested != (str(deal.need_id), str(deal.offer_id)):
+            return Response({'error': 'Idempotency-Key was already used for a different need or offer.'},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(self.get_serializer(deal).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='commissions', url_name='commissions-report')
+    def commissions_report(self, request):
         """
-        Обновляем состояние потребности и предложения при создании сделки.
+        Сводный отчёт по комиссиям за период.
+        Параметры: realtor — id риэлтора, from и to — даты сделок (ГГГГ-ММ-ДД, включительно)
+        или моменты времени в формате ISO 8601.
         """
-        deal = serializer.save()
-        deal.need.is_active = False
-        deal.need.save()
-        deal.offer.is_active = False
-        deal.offer.save()
+        deals = Deal.objects.all()
+
+        realtor_id = request.query_params.get('realtor')
+        if realtor_id:
+            try:
+                realtor_id = int(realtor_id)
+            except ValueError:
+                return Response({'error': 'Invalid realtor.'}, status=status.HTTP_400_BAD_REQUEST)
+            deals = deals.filter(Q(need__realtor_id=realtor_id) | Q(offer__realtor_id=realtor_id))
+        else:
+            realtor_id = None
+
+        for param, lookup in (('from', 'created_at__gte'), ('to', 'created_at__lt')):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                boundary = _parse_boundary(value, end=(param == 'to'))
+            except ValueError:
+                return Response({'error': f'Invalid {param} date.'}, status=status.HTTP_400_BAD_REQUEST)
+            deals = deals.filter(**{lookup: boundary})
+
+        return Response(commission_report(deals, realtor_id))
 
     @action(detail=True, methods=['get'], url_path='commissions')
     def retrieve_commissions(self, request, pk=None):
         """
-        Возвращает рассчитанные комиссии и отчисления для выбранной сделки.
+        Возвращает рассчитанные комиссии и отчисления для выбранной сделки (из кэша, если он актуален).
         """
-        deal = self.get_object()
-        commissions = deal.calculate_commissions()
+        try:
+            commissions = cached_commissions(int(pk))
+        except ValueError:
+            raise NotFound()
+        if commissions is None:
+            raise NotFound()
         return Response(commissions)
 
 
 
-class ActViewSet(viewsets.ModelViewSet):
+class MatchViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Подбор по материализованной таблице совпадений потребностей и предложений.
+    """
+
+    def get_queryset(self):
+        """
+        Фильтрация совпадений: property_type — тип недвижимости,
+        available=1 — только потребности и предложения вне сделок.
+        """
+        queryset = Match.objects.all()
+
+        property_type = self.request.query_params.get('property_type')
+        if property_type:
+            queryset = queryset.filter(need__property_type=property_type)
+
+        if self.request.query_params.get('available') in ('1', 'true'):
+            queryset = queryset.filter(need__is_active=True, offer__is_active=True)
+
+        return queryset
+
+    def list(self, request):
+        """
+        Возвращает список пар {need, offer}. С cursor или page_size — постранично по id,
+        иначе весь список потоком: таблица совпадений может быть очень большой.
+        """
+        queryset = self.get_queryset()
+        paginator = IdCursorPagination()
+        page = paginator.paginate_queryset(queryset.only('id', 'need_id', 'offer_id'), request, view=self)
+        if page is not None:
+            return paginator.get_paginated_response(
+                [{'need': match.need_id, 'offer': match.offer_id} for match in page]
+            )
+        rows = queryset.order_by('need_id', 'offer_id').values_list('need_id', 'offer_id')
+        return StreamingHttpResponse(self._stream_pairs(rows), content_type='application/json')
+
+    @staticmethod
+    def _stream_pairs(rows, chunk_size=5000):
+        yield '['
+        separator = ''
+        chunk = []
+        for need_id, offer_id in rows.iterator(chunk_size=chunk_size):
+            chunk.append(f'{separator}{{"need":{need_id},"offer":{offer_id}}}')
+            separator = ','
+            if len(chunk) == chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        yield ''.join(chunk) + ']'
+
+    @action(detail=False, methods=['get'])
+    def counts(self, request):
+        """
+        Количество совпадений: всего, по типам недвижимости и (при need/offer) для одного объекта.
+        """
+        ids = {}
+        for param in ('need', 'offer'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    ids[param] = int(value)
+                except ValueError:
+                    return Response({'error': f'Invalid {param}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset()
+        by_type = queryset.values('need__property_type').annotate(count=Count('id'))
+        data = {
+            'total': queryset.count(),
+            'by_property_type': {row['need__property_type']: row['count'] for row in by_type},
+        }
+        for param, pk in ids.items():
+            data[param] = queryset.filter(**{f'{param}_id': pk}).count()
+        return Response(data)
+
+
+class ActViewSet(ReplicaReadMixin, StreamingListMixin, viewsets.ModelViewSet):
     queryset = Act.objects.all()
     serializer_class = ActSerializer
 
     def get_queryset(self):
-        # Получаем только события на сегодня
-        today = datetime.date.today()
-        return Act.objects.filter(date_time__date=today)
+        """
+        Список событий за период [from, to): по умолчанию — за сегодня, при одном from — за день from.
+        Полуоткрытый диапазон вместо date_time__date, чтобы запрос шёл по индексу на date_time.
+        Остальные действия работают со всеми событиями.
+        """
+        if self.action != 'list':
+            return Act.objects.all()
+
+        start_value = self.request.query_params.get('from')
+        end_value = self.request.query_params.get('to')
+        try:
+            if start_value:
+                start = _parse_boundary(start_value)
+            else:
+                start = _parse_boundary(timezone.localdate().isoformat())
+            if end_value:
+                end = _parse_boundary(end_value, end=True)
+            else:
+                end = _parse_boundary(timezone.localtime(start).date().isoformat(), end=True)
+        except ValueError:
+            raise ParseError('Invalid from/to format.')
+        return Act.objects.starting_between(start, end)
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        События, пересекающиеся с интервалом date_time + duration (например, 01:30:00).
+        Параметр exclude — id события, которое не нужно учитывать (при редактировании).
+        """
+        date_time = request.query_params.get('date_time')
+        duration = parse_duration(request.query_params.get('duration', ''))
+        if not date_time or duration is None:
+            return Response({'error': 'date_time and duration are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = _parse_boundary(date_time)
+        except ValueError:
+            return Response({'error': 'Invalid date_time format.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        conflicts = Act.objects.overlapping(start, start + duration)
+        exclude = request.query_params.get('exclude')
+        if exclude:
+            try:
+                conflicts = conflicts.exclude(pk=int(exclude))
+            except ValueError:
+                return Response({'error': 'Invalid exclude.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(conflicts, many=True)
+        return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
     def create_act(self, request):
@@ -450,4 +686,57 @@ class ActViewSet(viewsets.ModelViewSet):
     def delete_act(self, request, pk=None):
         act = self.get_object()
         act.delete()
-        return Response(status=204)
\ No newline at end of file
+        return Response(status=204)
+
+
+class TransferViewSet(viewsets.ViewSet):
+    """
+    Потоковая выгрузка и загрузка наборов данных (clients, realtors, properties, offers,
+    needs, deals, acts) в CSV или JSONL: /api/transfer/<набор>/export/ и /api/transfer/<набор>/import/.
+    """
+    lookup_value_regex = '[a-z]+'
+
+    def _model(self, pk):
+        model = DATASETS.get(pk)
+        if model is None:
+            raise NotFound()
+        return model
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        Выгрузка набора данных; file_format — csv (по умолчанию) или jsonl.
+        """
+        model = self._model(pk)
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in CONTENT_TYPES:
+            return Response({'error': 'file_format must be csv or jsonl.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export_chunks(model, file_format), content_type=CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{pk}.{file_format}"'
+        return response
+
+    @action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request, pk=None):
+        """
+        Загрузка файла из поля file пакетами bulk_create.
+        on_conflict — ignore (по умолчанию) или update; file_format определяется по имени файла.
+        """
+        model = self._model(pk)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'File is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or guess_format(upload.name)
+        on_conflict = request.data.get('on_conflict', 'ignore')
+        if file_format not in CONTENT_TYPES or on_conflict not in ON_CONFLICT:
+            return Response({'error': 'Invalid file_format or on_conflict.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Крупные файлы Django держит во временном файле на диске и читает построчно
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            summary = Importer(model, on_conflict).run(read_rows(stream, file_format))
+        except IntegrityError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            stream.detach()
+        return Response(summary)
@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'api.routers.ReplicaStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -64,6 +65,7 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.IdCursorPagination',
 }
 
 TEMPLATES = [
@@ -101,11 +103,84 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Профиль SQLite для конкурентной нагрузки:
+# WAL — читатели не блокируют писателя и наоборот; synchronous=NORMAL в режиме WAL
+# сохраняет целостность базы, при сбое питания могут потеряться лишь последние транзакции;
+# mmap и кэш страниц (64 МБ) уменьшают число системных вызовов при чтении.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами потока, прагмы выполняются один раз при подключении
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            # Транзакция сразу берёт блокировку записи: без этого два писателя, начавшие
+            # с чтения, получают "database is locked" без ожидания busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+            # busy_timeout, секунд
+            'timeout': 20,
+        },
+    }
+}
+
+# Реплика для чтения (api/routers.py): путь к файлу SQLite, который поддерживает
+# в актуальном состоянии команда replicate_db. Без переменной окружения всё идёт в default.
+DATABASE_REPLICA = os.environ.get('DJANGO_DB_REPLICA')
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA,
+        'TEST': {'MIRROR': 'default'},
     }
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы, пока реплика не догонит
+REPLICA_STICKY_SECONDS = 15
+
+# Потоки пула для нечёткого и геопоиска и ранжирования в асинхронных эндпоинтах (api/async_views.py)
+ASYNC_CPU_WORKERS = 4
+# Потоки RapidFuzz на один нечёткий поиск по адресу (api/search.py); параллельные запросы
+# и так выполняются в разных потоках, поэтому по умолчанию один
+FUZZY_SEARCH_WORKERS = 1
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Локальная память процесса с LRU-вытеснением при достижении MAX_ENTRIES.
+# При нескольких процессах-воркерах кэш комиссий стоит перевести на общий
+# бэкенд (например, FileBasedCache), чтобы сброс по сигналам видели все процессы.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'commissions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'commissions',
+        # Секунд; ограничивает жизнь записи, если сброс всё же разминулся с расчётом
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+    # Кэш ответов API; для нескольких процессов подойдёт
+    # 'django.core.cache.backends.filebased.FileBasedCache' с общим каталогом
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
 }
 
 
@@ -147,6 +222,11 @@ STATIC_URL = 'static/'
 
 MEDIA_URL = '/media/'  # URL для доступа к медиафайлам
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Потоки фонового пула, который строит уменьшенные копии изображений объектов
+IMAGE_VARIANT_WORKERS = 2
+# Префикс internal-location nginx для X-Accel-Redirect (например, '/protected-media/');
+# None — файлы отдаёт само приложение
+MEDIA_ACCEL_REDIRECT = None
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field